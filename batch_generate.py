@@ -0,0 +1,355 @@
+"""
+Headless batch generation of British Council style worksheets.
+Reads a manifest (CSV or JSONL) of topic, skill, difficulty and output name rows and generates
+one final document per row. A results ledger is appended to as rows finish, so a rerun skips the
+rows that already succeeded.
+With --render-workers, generation and rendering run as two stages: threads wait on the model and
+hand the finished content to a bounded queue, and a process pool renders the PDFs from it, so
+layout work uses every core while the model server is kept busy.
+The content of every document is saved next to it as JSON, so verify_documents.py can check the PDFs against it.
+With --formats, every document is also exported as e.g. DOCX and HTML from the same generated content.
+
+Example:
+    python batch_generate.py manifest.csv --output-dir batch_output --workers 4 --max-requests 3
+    python batch_generate.py manifest.csv --workers 8 --render-workers 4
+    python batch_generate.py manifest.csv --render-workers 4 --formats pdf docx html
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from tasks import PreparationTask, MiddleTask, Discussion
+from british_council_final_document import BritishCouncilFinalDocument, save_sidecar
+from document_export import RENDERERS, export_document, export_path, render_format
+from running_ollama_easy import ResourceCreator, summarize_call_metrics
+from response_cache import ResponseCache
+from render_cache import RenderCache
+from example_retrieval import ExampleRetriever
+from response_repair import RepairStats
+from ollama_pool import OllamaEndpointPool
+from tracing import TRACER, configure_tracing
+
+
+def load_manifest(path: str) -> list:
+    """
+    Load the manifest rows from a CSV (with a header row) or JSONL file.
+
+    Returns:
+        list: One dict per row with keys "topic", "skill", "difficulty" and "output_name"
+
+    Raises:
+        ValueError: If several rows have the same output name, as they would overwrite each other's
+            document and ledger entry
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".json")):
+            raw_rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            raw_rows = list(csv.DictReader(f))
+
+    rows = []
+    row_numbers = {}  # Output name -> manifest row numbers using it
+    for i, raw in enumerate(raw_rows):
+        topic = (raw.get("topic") or "").strip()
+        if not topic:
+            print(f"Skipping manifest row {i+1}: no topic given")
+            continue
+        output_name = (raw.get("output_name") or "").strip() or topic.replace(" ", "_")
+        if not output_name.endswith(".pdf"):
+            output_name += ".pdf"
+        row_numbers.setdefault(output_name, []).append(i + 1)
+        rows.append({
+            "topic": topic,
+            "skill": (raw.get("skill") or "Reading").strip(),
+            "difficulty": (raw.get("difficulty") or "A1").strip(),
+            "output_name": output_name,
+        })
+    duplicates = [f"'{name}' (rows {', '.join(map(str, numbers))})" for name, numbers in row_numbers.items() if len(numbers) > 1]
+    if duplicates:
+        raise ValueError(f"Manifest rows share an output name: {'; '.join(duplicates)}. Please give each row its own output name.")
+    return rows
+
+
+def load_completed(ledger_path: str) -> set:
+    """
+    Read the results ledger and return the output names of rows that succeeded.
+    """
+    completed = set()
+    if not os.path.exists(ledger_path):
+        return completed
+    with open(ledger_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # A crash mid-write can leave a partial last line
+            if entry.get("status") == "ok":
+                completed.add(entry["output_name"])
+            else:
+                completed.discard(entry.get("output_name"))
+    return completed
+
+
+class BatchGenerator:
+    def __init__(self, output_dir: str = "batch_output", workers: int = 4, max_requests: int = 3, model: str = "deepseek-r1:latest", cache: ResponseCache = None, refresh: bool = False, retriever=None, hosts: list = None, combined: bool = False, render_workers: int = 0, render_queue_size: int = None, render_cache: RenderCache = None, formats: list = None):
+        """
+        Initialize the batch generator.
+
+        Args:
+            output_dir (str): Directory the generated documents and the ledger are written to
+            workers (int): Number of documents generated at the same time
+            max_requests (int): Maximum number of model requests in flight across all workers
+            model (str): The Ollama model to use
+            cache (ResponseCache, optional): Response cache shared by all rows
+            refresh (bool): Ignore cached responses but store the new ones
+            retriever (ExampleRetriever, optional): Index of existing resources to draw few-shot examples from
+            hosts (list, optional): Ollama hosts to balance the model requests over
+            combined (bool): Request all three sections of a worksheet in a single model call
+            render_workers (int): Number of processes rendering PDFs; 0 renders in the generating thread
+            render_queue_size (int, optional): Maximum generated documents waiting to be rendered, defaults to twice render_workers
+            render_cache (RenderCache, optional): Cache of rendered PDFs, so unchanged documents are not laid out again
+            formats (list, optional): Output formats from document_export.RENDERERS, each rendered from the same content. Defaults to ["pdf"].
+        """
+        self.output_dir = output_dir
+        self.workers = workers
+        self.model = model
+        self.cache = cache
+        self.refresh = refresh
+        self.retriever = retriever
+        self.repair_stats = RepairStats()  # Shared by every row's creator
+        self.endpoints = OllamaEndpointPool(hosts) if hosts else None
+        self.combined = combined
+        self.render_workers = render_workers
+        self.render_queue_size = render_queue_size or 2 * render_workers
+        self.render_cache = render_cache
+        self.formats = list(formats or ["pdf"])
+        self.call_metrics = []  # Per-call timings from every row's creator
+        self.limiter = threading.BoundedSemaphore(max_requests)
+        self.ledger_path = os.path.join(output_dir, "ledger.jsonl")
+        self._ledger_lock = threading.Lock()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def _record(self, row: dict, status: str, seconds: float, error: str = None):
+        entry = dict(row, status=status, seconds=round(seconds, 3), error=error, finished=time.time())
+        with self._ledger_lock:
+            with open(self.ledger_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _create_document(self, row: dict) -> BritishCouncilFinalDocument:
+        creator = ResourceCreator(topic=row["topic"], model=self.model, difficulty=row["difficulty"],
+                                  cache=self.cache, refresh=self.refresh, limiter=self.limiter,
+                                  skill=row["skill"], retriever=self.retriever, repair_stats=self.repair_stats,
+                                  endpoints=self.endpoints, call_metrics=self.call_metrics)
+        preptask = PreparationTask(skill=row["skill"], difficulty=row["difficulty"], topic=row["topic"])
+        midtask = MiddleTask(skill=row["skill"], difficulty=row["difficulty"], topic=row["topic"], task_types=["tf"])
+        discussion = Discussion(topic=row["topic"])
+        return BritishCouncilFinalDocument(
+            preparation_task=preptask,
+            middle_task=midtask,
+            discussion=discussion,
+            creator=creator,
+            render_cache=self.render_cache
+        )
+
+    def generate_row(self, row: dict) -> bool:
+        """
+        Generate the final document for one manifest row and record the result in the ledger.
+
+        Returns:
+            bool: True if the document was saved successfully
+        """
+        start = time.perf_counter()
+        output_path = os.path.join(self.output_dir, row["output_name"])
+        try:
+            document = self._create_document(row)
+            if self.formats == ["pdf"]:
+                if not document.generate_final_document(fp=output_path, combined=self.combined):
+                    raise RuntimeError("document could not be saved")
+            else:
+                with TRACER.span("document", fp=output_path, topic=row["topic"], formats=",".join(self.formats)):
+                    document.generate_content(combined=self.combined)
+                    # One format after another in this thread; --render-workers renders them in parallel processes
+                    results = export_document(document.to_document_model(output_path), output_path, self.formats)
+                failed = [f"{result['format']}: {result['error']}" for result in results if not result["ok"]]
+                if failed:
+                    raise RuntimeError("; ".join(failed))
+            save_sidecar(document.to_render_job(output_path))
+        except Exception as e:
+            self._record(row, "error", time.perf_counter() - start, str(e))
+            print(f"✗ {row['output_name']}: {e}")
+            return False
+        self._record(row, "ok", time.perf_counter() - start)
+        print(f"✓ {row['output_name']}")
+        return True
+
+    def generate_row_content(self, row: dict, render_queue: queue.Queue):
+        """
+        Generation stage of the pipeline: generate the content for one row and put
+        (row, document model or None, error, start time) on the render queue. Blocks while the queue is
+        full, so generation cannot run arbitrarily far ahead of rendering.
+        """
+        start = time.perf_counter()
+        try:
+            with TRACER.span("document", fp=os.path.join(self.output_dir, row["output_name"]), topic=row["topic"],
+                             skill=row["skill"], difficulty=row["difficulty"], pipelined=True):
+                document = self._create_document(row)
+                document.generate_content(combined=self.combined)
+                model = document.to_document_model(os.path.join(self.output_dir, row["output_name"]))
+                save_sidecar(model["render_job"])
+        except Exception as e:
+            render_queue.put((row, None, str(e), start))
+            return
+        render_queue.put((row, model, None, start))
+
+    def _finish_render(self, row: dict, start: float, futures: list) -> bool:
+        errors = []
+        seconds = 0.0
+        for future in futures:
+            try:
+                result = future.result()
+                # Rendered in a worker process, so the span is recorded here from the time it reported
+                TRACER.record("render", result["seconds"], fp=result["fp"], topic=row["topic"], format=result["format"],
+                              render_worker=True, status_ok=result["ok"],
+                              bytes_written=os.path.getsize(result["fp"]) if result["ok"] else 0)
+                seconds += result["seconds"]
+                if not result["ok"]:
+                    errors.append(f"{result['format']}: {result['error']}")
+            except Exception as e:
+                errors.append(str(e))
+        if errors:
+            error = "; ".join(errors)
+            self._record(row, "error", time.perf_counter() - start, error)
+            print(f"✗ {row['output_name']}: {error}")
+            return False
+        self._record(row, "ok", time.perf_counter() - start)
+        print(f"✓ {row['output_name']} (rendered in {seconds:.2f}s)")
+        return True
+
+    def _run_pipelined(self, pending: list, summary: dict):
+        """
+        Generate the rows in threads and render them in a process pool, connected by a bounded queue.
+        Each format of a document is a separate render job, so the formats render in parallel too.
+        A row is written to the ledger as soon as its last format has rendered, so an interrupted
+        batch can still be resumed from the rows that finished.
+        """
+        render_queue = queue.Queue(maxsize=self.render_queue_size)
+        render_slots = threading.BoundedSemaphore(self.render_queue_size)  # Jobs submitted but not yet rendered
+        summary_lock = threading.Lock()
+
+        def count(ok):
+            with summary_lock:
+                summary["ok" if ok else "error"] += 1
+
+        def format_done(state):
+            with summary_lock:
+                state["remaining"] -= 1
+                finished = state["remaining"] == 0
+            if finished:
+                count(self._finish_render(state["row"], state["start"], state["futures"]))
+
+        with ProcessPoolExecutor(max_workers=self.render_workers) as renderers, \
+                ThreadPoolExecutor(max_workers=self.workers) as generators:
+            generator_futures = [generators.submit(self.generate_row_content, row, render_queue) for row in pending]
+            try:
+                for _ in pending:
+                    row, model, error, start = render_queue.get()
+                    if model is None:
+                        self._record(row, "error", time.perf_counter() - start, error)
+                        print(f"✗ {row['output_name']}: {error}")
+                        count(False)
+                        continue
+                    state = {"row": row, "start": start, "futures": [], "remaining": len(self.formats)}
+                    for fmt in self.formats:
+                        render_slots.acquire()
+                        future = renderers.submit(render_format, fmt, model, export_path(model["render_job"]["fp"], fmt),
+                                                  RENDERERS[fmt][1])
+                        state["futures"].append(future)
+                        future.add_done_callback(lambda _: render_slots.release())
+                    for future in state["futures"]:
+                        future.add_done_callback(lambda _, state=state: format_done(state))
+            except BaseException:
+                # e.g. BrokenProcessPool. Generator threads may be blocked on the full queue, so cancel the
+                # rows not started yet and drain the queue until the rest finish, or the pool never shuts down.
+                for future in generator_futures:
+                    future.cancel()
+                while not all(future.done() for future in generator_futures):
+                    try:
+                        render_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+                raise
+
+    def run(self, rows: list) -> dict:
+        """
+        Generate every row that has not already succeeded according to the ledger.
+
+        Returns:
+            dict: Counts of "ok", "error" and "skipped" rows
+        """
+        completed = load_completed(self.ledger_path)
+        pending = [row for row in rows
+                   if row["output_name"] not in completed
+                   or not all(os.path.exists(export_path(os.path.join(self.output_dir, row["output_name"]), fmt))
+                              for fmt in self.formats)]
+        summary = {"ok": 0, "error": 0, "skipped": len(rows) - len(pending)}
+        print(f"Generating {len(pending)} document(s), skipping {summary['skipped']} already completed...")
+
+        if self.render_workers > 0:
+            self._run_pipelined(pending, summary)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.generate_row, row) for row in pending]
+                for future in as_completed(futures):
+                    summary["ok" if future.result() else "error"] += 1
+        print(f"Batch finished: {summary['ok']} ok, {summary['error']} failed, {summary['skipped']} skipped")
+        print(f"Model responses: {self.repair_stats.summary()}")
+        print(f"Model timings: {summarize_call_metrics(self.call_metrics)}")
+        if self.endpoints is not None:
+            for endpoint in self.endpoints.stats():
+                print(f"  {endpoint['host']}: {endpoint['requests']} request(s), {endpoint['failures']} failure(s)")
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate worksheets for every row of a topic manifest.")
+    parser.add_argument("manifest", help="CSV or JSONL file with topic, skill, difficulty and output_name columns")
+    parser.add_argument("--output-dir", default="batch_output", help="Directory for the documents and the ledger")
+    parser.add_argument("--workers", type=int, default=4, help="Number of documents generated at the same time")
+    parser.add_argument("--max-requests", type=int, default=3, help="Maximum model requests in flight")
+    parser.add_argument("--model", default="deepseek-r1:latest", help="Ollama model to use")
+    parser.add_argument("--cache-dir", default=".llm_cache", help="Directory of the response cache")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the response cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached responses but store the new ones")
+    parser.add_argument("--hosts", nargs="+", default=None, help="Ollama hosts to balance requests over")
+    parser.add_argument("--combined", action="store_true", help="Generate each worksheet's sections in a single model call")
+    parser.add_argument("--render-workers", type=int, default=0,
+                        help="Render PDFs in this many processes, separately from generation (0 renders in the generating threads)")
+    parser.add_argument("--formats", nargs="+", default=["pdf"], choices=sorted(RENDERERS),
+                        help="Formats to export every document in, all from the same generated content (rendered in parallel with --render-workers)")
+    parser.add_argument("--render-cache-dir", default=None, help="Reuse rendered PDFs stored in this directory")
+    parser.add_argument("--trace-file", default=None, help="Append a JSONL span for every model call, render and merge to this file")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus-style metrics on this port while the batch runs")
+    parser.add_argument("--examples-db", default=None, help="Extraction index to draw few-shot examples from")
+    args = parser.parse_args(argv)
+    try:
+        rows = load_manifest(args.manifest)
+    except ValueError as e:
+        parser.error(str(e))
+
+    configure_tracing(jsonl_path=args.trace_file, prometheus_port=args.metrics_port)
+    retriever = ExampleRetriever.from_index(args.examples_db) if args.examples_db else None
+    cache = None if args.no_cache else ResponseCache(args.cache_dir)
+    render_cache = RenderCache(args.render_cache_dir) if args.render_cache_dir else None
+    generator = BatchGenerator(output_dir=args.output_dir, workers=args.workers, max_requests=args.max_requests,
+                               model=args.model, cache=cache, refresh=args.refresh, retriever=retriever, hosts=args.hosts, combined=args.combined,
+                               render_workers=args.render_workers, render_cache=render_cache, formats=args.formats)
+    summary = generator.run(rows)
+    return 0 if summary["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
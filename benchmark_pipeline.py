@@ -0,0 +1,223 @@
+"""
+Benchmark of the generate -> render -> merge pipeline.
+Content comes from a fake creator returning canned content after a configurable latency (or, with
+--ollama-stub, from a real ResourceCreator talking to fake_ollama.py), so the numbers measure this
+code rather than the model. Every stage is timed separately and each scenario runs in a fresh
+process, so its peak RSS is its own. Results are appended to a JSONL file, tagged with the git
+revision, so runs of different versions can be compared.
+
+Example:
+    python benchmark_pipeline.py --docs 1 10 50 --extract-lines 8 80 --label before
+    python benchmark_pipeline.py --docs 1 10 50 --extract-lines 8 80 --label after --compare before
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from tasks import PreparationTask, MiddleTask, Discussion, TEMPLATE_VERSION
+from british_council_final_document import BritishCouncilFinalDocument
+from fake_ollama import CANNED_RESPONSES
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+STAGES = ("generate_content", "preparation_pdf", "middle_task_pdf", "discussion_pdf", "save_document", "render_document")
+
+
+class FakeResourceCreator:
+    """Stands in for ResourceCreator, returning canned content after a fixed latency per call."""
+
+    def __init__(self, topic: str, latency: float = 0.0, extract_lines: int = 8):
+        self.topic = topic
+        self.latency = latency
+        canned_lines = CANNED_RESPONSES["ResponseMidTask2"]["extract"].split("\n")
+        self.extract = "\n".join(canned_lines[i % len(canned_lines)] for i in range(extract_lines))
+
+    def create_preparation_task(self) -> dict:
+        time.sleep(self.latency)
+        return {"labels": list(CANNED_RESPONSES["ResponsePrep"]["answer"]["labels"]),
+                "correct_pairs": dict(CANNED_RESPONSES["ResponsePrep"]["answer"]["correct_pairs"])}
+
+    def create_middle_task(self) -> dict:
+        time.sleep(self.latency)
+        canned = CANNED_RESPONSES["ResponseMidTask2"]
+        return {"topic": self.topic, "extract": self.extract,
+                "questions": list(canned["questions"]), "answers": list(canned["answers"])}
+
+    def create_discussion(self) -> dict:
+        time.sleep(self.latency)
+        return dict(CANNED_RESPONSES["ResponseDiscussion"]["answer"])
+
+    def create_worksheet(self) -> dict:
+        time.sleep(self.latency)
+        return {"preparation_task": self.create_preparation_task(), "middle_task": self.create_middle_task(),
+                "discussion": self.create_discussion()}
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile of a non-empty list, q between 0 and 100."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB, or None where it cannot be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KB on Linux
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _timed(timings: dict, stage: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    timings.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+
+def benchmark_document(index: int, timings: dict, output_dir: str, latency: float, extract_lines: int, ollama_host: str = None):
+    """Generate, render and merge one document, adding the time of every stage to timings."""
+    topic = f"Benchmark topic {index}"
+    if ollama_host is not None:
+        from running_ollama_easy import ResourceCreator
+        from ollama_pool import OllamaEndpointPool
+        creator = ResourceCreator(topic=topic, use_cache=False, endpoints=OllamaEndpointPool([ollama_host]))
+    else:
+        creator = FakeResourceCreator(topic, latency, extract_lines)
+    document = BritishCouncilFinalDocument(
+        preparation_task=PreparationTask(skill="Reading", difficulty="A1", topic=topic),
+        middle_task=MiddleTask(skill="Reading", difficulty="A1", topic=topic, task_types=["tf"]),
+        discussion=Discussion(topic=topic),
+        creator=creator
+    )
+    _timed(timings, "generate_content", document.generate_content)
+
+    # The per-section renders merged with PyPDF2, as in generate_final_document(single_pass=False)
+    document.task_pdfs = [
+        _timed(timings, "preparation_pdf", lambda: document.preparation_task._create_matching_task_pdf()),
+        _timed(timings, "middle_task_pdf", lambda: document.middle_task._create_pdf()),
+        _timed(timings, "discussion_pdf", lambda: document.discussion.generate_pdf_content(BytesIO())),
+    ]
+    for pdf in document.task_pdfs:
+        pdf.seek(0)
+    _timed(timings, "save_document", lambda: document.save_document(os.path.join(output_dir, f"merged_{index}.pdf")))
+
+    # The single-pass renderer used by default
+    _timed(timings, "render_document", lambda: document.render_document(os.path.join(output_dir, f"single_pass_{index}.pdf")))
+
+
+def run_scenario(docs: int, extract_lines: int, latency: float, output_dir: str, ollama_host: str = None) -> dict:
+    """
+    Run one scenario and summarise it. Meant to run in its own process, so the peak RSS belongs to the scenario.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    timings = {}
+    document_seconds = []
+    start = time.perf_counter()
+    for index in range(docs):
+        document_start = time.perf_counter()
+        benchmark_document(index, timings, output_dir, latency, extract_lines, ollama_host)
+        document_seconds.append(time.perf_counter() - document_start)
+    wall = time.perf_counter() - start
+    return {
+        "docs": docs,
+        "extract_lines": extract_lines,
+        "latency": latency,
+        "ollama_stub": ollama_host is not None,
+        "wall_seconds": round(wall, 4),
+        "docs_per_second": round(docs / wall, 3) if wall > 0 else None,
+        "document_p50": round(percentile(document_seconds, 50), 4),
+        "document_p95": round(percentile(document_seconds, 95), 4),
+        "stages": {stage: {"p50": round(percentile(timings[stage], 50), 4),
+                           "p95": round(percentile(timings[stage], 95), 4),
+                           "mean": round(sum(timings[stage]) / len(timings[stage]), 4)}
+                   for stage in STAGES if stage in timings},
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+    }
+
+
+def load_results(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def print_result(result: dict, baseline: dict = None):
+    def change(key, value, stage=None):
+        if baseline is None:
+            return ""
+        before = baseline["stages"].get(stage, {}).get(key) if stage else baseline.get(key)
+        return f" ({(value - before) / before:+.0%})" if before else ""
+
+    print(f"{result['docs']} doc(s), {result['extract_lines']} extract line(s): "
+          f"{result['docs_per_second']} docs/s{change('docs_per_second', result['docs_per_second'])}, "
+          f"p50 {result['document_p50']:.3f}s, p95 {result['document_p95']:.3f}s{change('document_p95', result['document_p95'])}, "
+          f"peak RSS {result['peak_rss_mb']} MB")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<17} p50 {stats['p50']:.4f}s  p95 {stats['p95']:.4f}s{change('p95', stats['p95'], stage)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark content generation, rendering and merging of final documents.")
+    parser.add_argument("--docs", type=int, nargs="+", default=[1, 10], help="Document counts to benchmark")
+    parser.add_argument("--extract-lines", type=int, nargs="+", default=[8, 80], help="Middle task extract lengths, in lines")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the fake creator waits per model call")
+    parser.add_argument("--ollama-stub", action="store_true",
+                        help="Use a real ResourceCreator against a local fake Ollama server instead of the fake creator")
+    parser.add_argument("--output-dir", default="bench_output", help="Directory for the benchmark PDFs")
+    parser.add_argument("--results", default="benchmark_results.jsonl", help="File the results are appended to")
+    parser.add_argument("--label", default=None, help="Name of this run, e.g. a branch or version")
+    parser.add_argument("--compare", default=None, help="Label of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    server = None
+    ollama_host = None
+    if args.ollama_stub:
+        from fake_ollama import start_fake_ollama
+        server = start_fake_ollama(latency=args.latency, tokens_per_second=0)
+        ollama_host = f"http://127.0.0.1:{server.server_port}"
+
+    previous = load_results(args.results)
+    revision = git_revision()
+    try:
+        for docs in args.docs:
+            for extract_lines in args.extract_lines:
+                # A new executor per scenario, so each one runs in a fresh process
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(run_scenario, docs, extract_lines, args.latency,
+                                             args.output_dir, ollama_host).result()
+                result.update(label=args.label, git_revision=revision, template_version=TEMPLATE_VERSION, created=time.time())
+                baseline = None
+                if args.compare is not None:
+                    matches = [entry for entry in previous if entry.get("label") == args.compare
+                               and (entry["docs"], entry["extract_lines"], entry["latency"], entry.get("ollama_stub"))
+                               == (docs, extract_lines, args.latency, result["ollama_stub"])]
+                    baseline = matches[-1] if matches else None
+                print_result(result, baseline)
+                with open(args.results, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(result) + "\n")
+    finally:
+        if server is not None:
+            server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,128 +3,331 @@ Will take as input a PreprationTask object, a list of Task objects, (ideally len
 and a Discussion object. It will then generate a final document that is a pdf with the sections based on
 the objects provided.
 """
-from tasks import PreparationTask, MiddleTask, Discussion
+from tasks import PreparationTask, MiddleTask, Discussion, TEMPLATE_VERSION
 from PyPDF2 import PdfReader, PdfWriter
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from running_ollama_easy import ResourceCreator
+from render_cache import RenderCache
+from tracing import TRACER
+import contextvars
+import hashlib
+import json
 
 class BritishCouncilFinalDocument:
-    def __init__(self, preparation_task : PreparationTask, middle_task : MiddleTask, discussion : Discussion, creator : ResourceCreator = None):
+    def __init__(self, preparation_task : PreparationTask, middle_task : MiddleTask, discussion : Discussion, creator : ResourceCreator = None, render_cache : RenderCache = None):
         """
         Initialize the final document generator.
+        If a render_cache is given, rendered PDFs are looked up in it by content, template version
+        and seed, so a document whose content has not changed is not laid out again.
         """
         self.preparation_task = preparation_task
         self.middle_task = middle_task
         self.discussion = discussion
         self.creator = creator
+        self.render_cache = render_cache
         self.task_pdfs = []  # Store PDF buffers for each task section
-        if self.creator is None:
+        self.section_timings = {}  # Seconds spent generating each section's content
+        if self.creator is None and any(task.content_dict is None for task in (preparation_task, middle_task, discussion)):
             print("WARNING: No creator specified. Creator is needed for generation.")
             
-    def generate_final_document(self, fp : str = "final_document.pdf") -> bool:
+    def generate_final_document(self, fp : str = "final_document.pdf", concurrent : bool = True, single_pass : bool = True, combined : bool = False) -> bool:
         """
         Will generate a final document that is a pdf with the sections based on
         the objects provided.
         Saves the document to the current working directory.
+        If concurrent is True, the content for the three sections is requested from the
+        creator in parallel, so the wall-clock time is roughly that of the slowest model call.
+        If single_pass is True, every section is drawn onto one shared canvas that is written straight
+        to fp, instead of rendering each section separately and merging them with PyPDF2.
+        If combined is True, the content for all sections is requested in a single model call,
+        falling back to separate calls only for sections that fail validation.
         Returns True if the document is generated successfully, False otherwise.
         """
-        print("Generating final document...")
-        print("Generating preparation task section...")
-        self._generate_preparation_task_section()
-        print("Generating tasks section...")
-        self._generate_tasks_section()
-        print("Generating discussion section...")
-        self._generate_discussion_section()
-        self.save_document(fp)
-        return True
+        with TRACER.span("document", fp=fp, topic=self.preparation_task.topic, skill=self.preparation_task.skill,
+                         difficulty=self.preparation_task.difficulty, single_pass=single_pass, combined=combined):
+            if single_pass:
+                self.generate_content(concurrent=concurrent, combined=combined)
+                return self.render_document(fp)
+            self.section_timings = {}
+            if combined:
+                self._generate_combined_content()
+            elif concurrent:
+                self._generate_all_content()
+            self._generate_preparation_task_section()
+            self._generate_tasks_section()
+            self._generate_discussion_section()
+            self.report_section_timings()
+            return self.save_document(fp)
+
+    def generate_content(self, concurrent : bool = True, combined : bool = False):
+        """
+        Will generate the content for every section that has none, without rendering anything.
+        Used on its own when the rendering is done elsewhere, e.g. by a render worker process.
+        """
+        with TRACER.span("generate_content", topic=self.preparation_task.topic, concurrent=concurrent, combined=combined):
+            self.section_timings = {}
+            if combined:
+                self._generate_combined_content()
+            elif concurrent:
+                self._generate_all_content()
+            self._generate_preparation_task_content()
+            self._generate_tasks_content()
+            self._generate_discussion_content()
+            self.report_section_timings()
+
+    def to_render_job(self, fp : str = "final_document.pdf") -> dict:
+        """
+        Will return a picklable description of the document, with the content of every section,
+        that render_job can turn back into a PDF in another process.
+        """
+        return {
+            "fp": fp,
+            "skill": self.preparation_task.skill,
+            "difficulty": self.preparation_task.difficulty,
+            "topic": self.preparation_task.topic,
+            "middle_skill": self.middle_task.skill,
+            "middle_difficulty": self.middle_task.difficulty,
+            "task_types": self.middle_task.task_types,
+            "discussion_topic": self.discussion.topic,
+            "preparation_task": self.preparation_task.content_dict,
+            "middle_task": self.middle_task.content_dict,
+            "discussion": self.discussion.content_dict,
+            "seeds": [task.seed for task in (self.preparation_task, self.middle_task, self.discussion)],
+            "render_cache_dir": self.render_cache.cache_dir if self.render_cache is not None else None,
+        }
+
+    def to_document_model(self, fp : str = "final_document.pdf") -> dict:
+        """
+        Will return the document in a format-neutral form that document_export renders as PDF, DOCX or HTML:
+        the blocks of every section, plus the render job the PDF layout is drawn from.
+        All content must already be generated.
+        """
+        return {
+            "skill": self.preparation_task.skill,
+            "difficulty": self.preparation_task.difficulty,
+            "topic": self.preparation_task.topic,
+            "sections": [task.to_section() for task in (self.preparation_task, self.middle_task, self.discussion)],
+            "render_job": self.to_render_job(fp),
+        }
+
+    def _generate_all_content(self):
+        """
+        Will request the content for every section concurrently and wait for all of them.
+        The model calls are independent of each other, so they can run at the same time.
+        Rendering still happens in order afterwards, as the sections share a page order.
+        """
+        content_generators = [
+            self._generate_preparation_task_content,
+            self._generate_tasks_content,
+            self._generate_discussion_content,
+        ]
+        with ThreadPoolExecutor(max_workers=len(content_generators)) as executor:
+            # Each worker runs in a copy of this context, so its spans nest under the current one
+            futures = [executor.submit(contextvars.copy_context().run, generator) for generator in content_generators]
+            for future in futures:
+                future.result()  # Re-raise any error from the worker thread
+
+    def _generate_combined_content(self):
+        """
+        Will request the content for every section that has none with a single model call.
+        """
+        missing = [task for task in (self.preparation_task, self.middle_task, self.discussion) if task.content_dict == None]
+        if not missing:
+            return
+        worksheet = self._timed("Combined worksheet", self.creator.create_worksheet)
+        if self.preparation_task.content_dict == None:
+            self.preparation_task.content_dict = worksheet["preparation_task"]
+        if self.middle_task.content_dict == None:
+            self.middle_task.content_dict = worksheet["middle_task"]
+            self.middle_task.update_attributes()
+        if self.discussion.content_dict == None:
+            self.discussion.content_dict = worksheet["discussion"]
+            self.discussion.update_attributes()
+
+    def _timed(self, section : str, generator):
+        """
+        Will run the given content generator and record how long it took under the section name.
+        """
+        start = time.perf_counter()
+        try:
+            return generator()
+        finally:
+            self.section_timings[section] = time.perf_counter() - start
+
+    def report_section_timings(self):
+        """
+        Will print how long the content for each section took to generate.
+        """
+        for section, seconds in self.section_timings.items():
+            print(f"{section} content took {seconds:.2f}s")
+
+    def _generate_preparation_task_content(self):
+        """
+        Will generate the content for the preparation task if none was provided.
+        """
+        if not self.preparation_task or self.preparation_task.content_dict == None:
+            self.preparation_task.content_dict = self._timed("Preparation task", self.creator.create_preparation_task)
 
     def _generate_preparation_task_section(self):
         """
         Will generate a section for the preparation task.
         """
-        print("Generating preparation task section...")
-        if not self.preparation_task or self.preparation_task.content_dict == None:
-            print("No preparation task content provided.")
-            print("We will attempt to generate it now...")
-            self.preparation_task.content_dict = self.creator.create_preparation_task()
-            print("--PREPARATION TASK CREATED--")
-            print(self.preparation_task.content_dict)
-            print("--PREPARATION TASK CREATED--")
+        self._generate_preparation_task_content()
         # Create PDF for preparation task
-        prep_pdf = self.preparation_task._create_matching_task_pdf()
-        prep_pdf.seek(0)
+        prep_pdf = self.preparation_task.render_pdf(self.render_cache)
         self.task_pdfs.append(prep_pdf)
-    
-    def _generate_tasks_section(self):
+
+    def _generate_tasks_content(self):
         """
-        Will generate a section for the tasks.
+        Will generate the content for the middle task if none was provided.
         """
         if self.middle_task.content_dict == None:
-            print("No middle task content provided.")
-            print("We will attempt to generate it now...")
-            self.middle_task.content_dict = self.creator.create_middle_task()
+            self.middle_task.content_dict = self._timed("Middle task", self.creator.create_middle_task)
             self.middle_task.update_attributes()
-            print("---MIDDLE TASK CONFTETNT DICT---")
-            print(self.middle_task.content_dict)
-            print("---MIDDLE TASK CONTENT DICT END---")
-        
+
+    def _generate_tasks_section(self):
+        """
+        Will generate a section for the tasks.
+        """
+        self._generate_tasks_content()
         # Create PDF for middle task
-        mid_pdf = self.middle_task._create_pdf()
-        mid_pdf.seek(0)
+        mid_pdf = self.middle_task.render_pdf(self.render_cache)
         self.task_pdfs.append(mid_pdf)
-    
-    def _generate_discussion_section(self):
+
+    def _generate_discussion_content(self):
         """
-        Will generate a section for the discussion.
+        Will generate the content for the discussion if none was provided.
         """
         if self.discussion.content_dict == None:
-            print("No discussion content provided.")
-            print("We will attempt to generate it now...")
-            self.discussion.content_dict = self.creator.create_discussion()
+            self.discussion.content_dict = self._timed("Discussion", self.creator.create_discussion)
             self.discussion.update_attributes()
-            print("--CONTENT DICTIONARY--")
-            print(self.discussion.content_dict)
-            print("--CONTENT DICTIONARY--")
+
+    def _generate_discussion_section(self):
+        """
+        Will generate a section for the discussion.
+        """
+        self._generate_discussion_content()
         # Create PDF for discussion
-        disc_pdf = self.discussion.generate_pdf_content()
-        disc_pdf.seek(0)
+        disc_pdf = self.discussion.render_pdf(self.render_cache)
         self.task_pdfs.append(disc_pdf)
     
+    def render_document(self, fp : str = "final_document.pdf") -> bool:
+        """
+        Draws every section onto a single canvas and writes the document once, with no
+        intermediate per-section PDFs to parse and merge. All content must already be generated.
+        Returns True if the document is saved successfully, False otherwise.
+        """
+        with TRACER.span("render", fp=fp, sections=3) as span:
+            try:
+                tasks = (self.preparation_task, self.middle_task, self.discussion)
+                key = None
+                if self.render_cache is not None:
+                    content_hash = hashlib.sha256("".join(task.content_hash() for task in tasks).encode("utf-8")).hexdigest()
+                    key = self.render_cache.make_key(content_hash, TEMPLATE_VERSION, [task.render_seed() for task in tasks])
+                    cached = self.render_cache.get(key)
+                    if cached is not None:
+                        with open(fp, "wb") as f:
+                            f.write(cached)
+                        span.set(cache_hit=True, bytes_written=len(cached))
+                        print(f"Final document unchanged, saved from the render cache as {fp}")
+                        return True
+                packet = BytesIO()
+                can = canvas.Canvas(packet, pagesize=A4, invariant=1)  # No timestamps, so the bytes are reproducible
+                for task in tasks:
+                    task.use_canvas(can)
+                    task.draw_content()
+                    can.showPage()
+                can.save()
+                with open(fp, "wb") as f:
+                    f.write(packet.getvalue())
+                if key is not None:
+                    self.render_cache.set(key, packet.getvalue())
+                span.set(cache_hit=False, bytes_written=len(packet.getvalue()), pages=can.getPageNumber() - 1)
+                print(f"Final document saved successfully as {fp}")
+                return True
+            except Exception as e:
+                span.status, span.error = "error", str(e)
+                print(f"Error saving document: {e}")
+                return False
+
     def save_document(self, fp : str = "final_document.pdf") -> bool:
         """
         Saves the document to the current working directory.
         Combines all task PDFs into a single document.
         Returns True if the document is saved successfully, False otherwise.
         """
-        print("Merging all sections into final document...")
-        try:
-            output_pdf = PdfWriter()
-            
-            # Merge all PDFs
-            for i, task_pdf in enumerate(self.task_pdfs):
-                try:
-                    pdf_reader = PdfReader(task_pdf)
-                    print(f"Adding section {i+1} with {len(pdf_reader.pages)} page(s)...")
-                    for page in pdf_reader.pages:
-                        output_pdf.add_page(page)
-                except Exception as e:
-                    print(f"Error processing section {i+1}: {e}")
-                    continue
-            
-            # Save the combined PDF
-            with open(fp, "wb") as f:
-                output_pdf.write(f)
-            print(f"Final document saved successfully as {fp}")
-            return True
-        except Exception as e:
-            print(f"Error saving document: {e}")
-            return False
-    
+        with TRACER.span("merge", fp=fp, sections=len(self.task_pdfs)) as span:
+            try:
+                output_pdf = PdfWriter()
+                
+                # Merge all PDFs
+                for i, task_pdf in enumerate(self.task_pdfs):
+                    try:
+                        pdf_reader = PdfReader(task_pdf)
+                        for page in pdf_reader.pages:
+                            output_pdf.add_page(page)
+                    except Exception as e:
+                        print(f"Error processing section {i+1}: {e}")
+                        span.set(failed_sections=span.attributes.get("failed_sections", 0) + 1)
+                        continue
+                
+                # Save the combined PDF
+                with open(fp, "wb") as f:
+                    output_pdf.write(f)
+                span.set(pages=len(output_pdf.pages), bytes_written=os.path.getsize(fp))
+                print(f"Final document saved successfully as {fp}")
+                return True
+            except Exception as e:
+                span.status, span.error = "error", str(e)
+                print(f"Error saving document: {e}")
+                return False
+
+
+def sidecar_path(fp : str) -> str:
+    """
+    Will return where the content of the document at fp is stored, e.g. batch_output/food.json for batch_output/food.pdf.
+    """
+    return os.path.splitext(fp)[0] + ".json"
+
+
+def save_sidecar(job : dict) -> str:
+    """
+    Will write a render job (see BritishCouncilFinalDocument.to_render_job) next to its PDF as JSON,
+    so the content and seeds a document was rendered from can be checked against it later.
+    Returns the path of the sidecar.
+    """
+    path = sidecar_path(job["fp"])
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(job, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def render_job(job : dict) -> dict:
+    """
+    Will render a document described by BritishCouncilFinalDocument.to_render_job.
+    Only takes and returns plain data, so it can run in a ProcessPoolExecutor worker.
+    Returns a dict with the output path, whether the document was saved and the render time in seconds.
+    """
+    start = time.perf_counter()
+    prep_seed, middle_seed, discussion_seed = job.get("seeds") or (None, None, None)
+    document = BritishCouncilFinalDocument(
+        preparation_task = PreparationTask(skill = job["skill"], difficulty = job["difficulty"], topic = job["topic"],
+                                           content_dict = job["preparation_task"], seed = prep_seed),
+        middle_task = MiddleTask(skill = job["middle_skill"], difficulty = job["middle_difficulty"], topic = job["topic"],
+                                 task_types = job["task_types"], content_dict = job["middle_task"], seed = middle_seed),
+        discussion = Discussion(topic = job["discussion_topic"], content_dict = job["discussion"], seed = discussion_seed),
+        render_cache = RenderCache(job["render_cache_dir"]) if job.get("render_cache_dir") else None,
+    )
+    ok = document.render_document(job["fp"])
+    return {"fp": job["fp"], "ok": ok, "seconds": time.perf_counter() - start}
+
 
 if __name__ == "__main__":
     
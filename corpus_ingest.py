@@ -0,0 +1,139 @@
+"""
+Ingestion pipeline for the resources/ PDF library.
+Walks the resource tree, runs the extraction functions from pdf_parsing_section_extractor on every
+PDF in a process pool and emits one structured record per document.
+
+Example:
+    python corpus_ingest.py resources --output corpus.jsonl --workers 8
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from pdf_parsing_section_extractor import (
+    extract_document,
+    extract_title_and_level,
+    split_reading_pdf_sections,
+    parse_answer_pairs,
+    create_word_mapping_dict,
+)
+
+SKILLS = ["Reading", "Writing", "Speaking", "Listening"]
+
+
+def find_pdfs(root: str = "resources") -> list:
+    """
+    Find every PDF under root, in a stable order.
+    """
+    pdf_paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(".pdf"):
+                pdf_paths.append(os.path.join(dirpath, filename))
+    return sorted(pdf_paths)
+
+
+def skill_from_path(path: str) -> str:
+    """
+    Work out the skill from a "LearnEnglish-Skill-Level-Topic.pdf" filename, falling back to the folder name.
+    """
+    parts = os.path.basename(path).split("-")
+    if len(parts) > 1 and parts[1].capitalize() in SKILLS:
+        return parts[1].capitalize()
+    folder = os.path.basename(os.path.dirname(path)).split("_")[0].capitalize()
+    return folder if folder in SKILLS else None
+
+
+def extract_record(full_text: str, sections: dict = None) -> dict:
+    """
+    Run the section extractors over a document's text.
+
+    Args:
+        full_text (str): The document's text
+        sections (dict, optional): Sections already found, e.g. by extract_document. Split from full_text if None.
+
+    Returns:
+        dict: The level, title, parsed sections, answer dictionary and word mapping
+    """
+    if sections is None:
+        sections = split_reading_pdf_sections(full_text)
+    level, title = extract_title_and_level(full_text)
+    answer_dict = parse_answer_pairs(sections["Answers"]) if "Answers" in sections else {}
+    word_mapping = create_word_mapping_dict(sections.get("Preparation Task", ""), answer_dict)
+    return {
+        "level": level,
+        "title": title,
+        "sections": sections,
+        "answers": answer_dict,
+        "word_mapping": word_mapping,
+    }
+
+
+def ingest_pdf(path: str, quiet: bool = True) -> dict:
+    """
+    Extract one PDF. Errors are recorded on the record instead of raised, so one bad file
+    does not stop the rest of the corpus.
+
+    Args:
+        path (str): Path to the PDF
+        quiet (bool): Silence the extractors' debug printing
+
+    Returns:
+        dict: One structured record for the document
+    """
+    start = time.perf_counter()
+    record = {"path": path, "skill": skill_from_path(path), "pages": 0, "pages_read": 0, "error": None}
+    try:
+        # One pass over the pages' lines, stopping after the answers
+        if quiet:
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                document = extract_document(path)
+        else:
+            document = extract_document(path)
+        record["pages"] = document["pages"]
+        record["pages_read"] = document["pages_read"]
+        extracted = extract_record(document["text"], document["sections"])
+        extracted["labels"] = document["labels"]
+        record.update(extracted)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def ingest_corpus(root: str = "resources", workers: int = None, paths: list = None) -> list:
+    """
+    Ingest every PDF under root (or the given paths) with a process pool.
+
+    Returns:
+        list: One record per document, in path order
+    """
+    paths = find_pdfs(root) if paths is None else paths
+    if not paths:
+        return []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Small chunks keep the workers balanced, as the PDFs vary a lot in size
+        return list(executor.map(ingest_pdf, paths, chunksize=4))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract structured records from every PDF in the resource library.")
+    parser.add_argument("root", nargs="?", default="resources", help="Root folder of the resource library")
+    parser.add_argument("--output", default="corpus.jsonl", help="JSONL file to write the records to")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    records = ingest_corpus(args.root, workers=args.workers)
+    with open(args.output, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    failed = sum(1 for record in records if record["error"])
+    print(f"Ingested {len(records)} document(s) ({failed} failed) in {time.perf_counter() - start:.2f}s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,227 @@
+"""
+Multi-format export of final documents.
+A document is turned into a format-neutral model once (see BritishCouncilFinalDocument.to_document_model):
+the blocks of every section, plus the render job the PDF layout is drawn from. DOCX and HTML are
+rendered from the blocks; the PDF is drawn by the task layout code from the render job. The renderers in
+RENDERERS each turn that model into one file, so producing several formats costs one generation and
+a cheap render per format. Given a process pool, the formats render at the same time.
+
+Block types:
+    heading, subheading, instruction, text, emphasis: {"type", "text"}
+    table: {"type", "header", "rows"}, e.g. the items and answers of a matching task
+    question: {"type", "text", "label"}, a question with its answer label, e.g. "True/False"
+    answers: {"type", "title", "lines"}, an answer key with an optional subtitle
+    page_break: {"type"}
+
+Example:
+    document.generate_content()
+    export_document(document.to_document_model("food.pdf"), "food.pdf", ["pdf", "docx", "html"])
+"""
+import os
+import time
+from html import escape
+from british_council_final_document import render_job
+
+try:
+    import docx
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Pt
+except ImportError:  # python-docx is only needed for DOCX output
+    docx = None
+
+HTML_STYLE = """
+body { font-family: Helvetica, Arial, sans-serif; font-size: 12pt; max-width: 170mm; margin: 20mm auto; }
+header { text-align: right; }
+header .topic { font-size: 18pt; }
+section + section, .page-break { break-before: page; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { text-align: left; padding: 2px 24px 2px 0; vertical-align: top; }
+.question { display: flex; justify-content: space-between; margin: 0.5em 0; }
+.question strong { margin-left: 2em; white-space: nowrap; }
+"""
+
+
+def render_pdf(model: dict, fp: str):
+    """
+    The existing ReportLab layout, drawn from the model's render job rather than from the blocks.
+    This deliberately bypasses the blocks: the PDF keeps the task layouts (templates, shuffled
+    matching columns, paginated frames) the blocks do not describe. Both are built from the same task
+    content by to_document_model, and tests/test_document_export.py checks that the PDF carries
+    every block's text.
+    """
+    result = render_job(dict(model["render_job"], fp=fp))
+    if not result["ok"]:
+        raise RuntimeError("document could not be saved")
+
+
+def _html_block(block: dict) -> str:
+    kind = block["type"]
+    if kind == "heading":
+        return f"<h2>{escape(block['text'])}</h2>"
+    if kind == "subheading":
+        return f"<h3>{escape(block['text'])}</h3>"
+    if kind == "instruction":
+        return f'<p class="instruction">{escape(block["text"])}</p>'
+    if kind == "text":
+        return "<p>" + "<br>\n".join(escape(line) for line in block["text"].split("\n")) + "</p>"
+    if kind == "emphasis":
+        return f"<p><em>{escape(block['text'])}</em></p>"
+    if kind == "table":
+        header = "".join(f"<th>{escape(cell)}</th>" for cell in block["header"])
+        rows = "\n".join("<tr>" + "".join(f"<td>{escape(cell)}</td>" for cell in row) + "</tr>" for row in block["rows"])
+        return f"<table>\n<thead><tr>{header}</tr></thead>\n<tbody>\n{rows}\n</tbody>\n</table>"
+    if kind == "question":
+        return f'<div class="question"><span>{escape(block["text"])}</span><strong>{escape(block["label"])}</strong></div>'
+    if kind == "answers":
+        parts = ['<div class="answers">', "<h2>Answers:</h2>"]
+        if block.get("title"):
+            parts.append(f"<h3>{escape(block['title'])}</h3>")
+        parts.extend(f"<p>{escape(line)}</p>" for line in block["lines"])
+        parts.append("</div>")
+        return "\n".join(parts)
+    if kind == "page_break":
+        return '<div class="page-break"></div>'
+    raise ValueError(f"Unknown block type: {kind}")
+
+
+def render_html(model: dict, fp: str):
+    """A single HTML page, with a page break before every section when printed."""
+    parts = ["<!DOCTYPE html>", '<html lang="en">', "<head>", '<meta charset="utf-8">',
+             f"<title>{escape(model['topic'])}</title>", f"<style>{HTML_STYLE}</style>", "</head>", "<body>"]
+    for section in model["sections"]:
+        parts.append("<section>")
+        parts.append(f'<header><div>{escape(section["skill"])}: {escape(section["difficulty"])}</div>'
+                     f'<div class="topic">{escape(section["topic"])}</div></header>')
+        parts.extend(_html_block(block) for block in section["blocks"])
+        parts.append("</section>")
+    parts.extend(["</body>", "</html>"])
+    with open(fp, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts) + "\n")
+
+
+def _add_docx_block(document, block: dict):
+    kind = block["type"]
+    if kind == "heading":
+        document.add_heading(block["text"], level=1)
+    elif kind == "subheading":
+        document.add_heading(block["text"], level=2)
+    elif kind == "instruction":
+        document.add_paragraph(block["text"])
+    elif kind == "text":
+        paragraph = document.add_paragraph()
+        lines = block["text"].split("\n")
+        for i, line in enumerate(lines):
+            run = paragraph.add_run(line)
+            if i < len(lines) - 1:
+                run.add_break()
+    elif kind == "emphasis":
+        document.add_paragraph().add_run(block["text"]).italic = True
+    elif kind == "table":
+        table = document.add_table(rows=1, cols=len(block["header"]))
+        for cell, text in zip(table.rows[0].cells, block["header"]):
+            cell.paragraphs[0].add_run(text).bold = True
+        for row in block["rows"]:
+            for cell, text in zip(table.add_row().cells, row):
+                cell.text = text
+    elif kind == "question":
+        paragraph = document.add_paragraph(block["text"] + "\t")
+        paragraph.add_run(block["label"]).bold = True
+    elif kind == "answers":
+        document.add_heading("Answers:", level=1)
+        if block.get("title"):
+            document.add_heading(block["title"], level=2)
+        for line in block["lines"]:
+            document.add_paragraph(line)
+    elif kind == "page_break":
+        document.add_page_break()
+    else:
+        raise ValueError(f"Unknown block type: {kind}")
+
+
+def render_docx(model: dict, fp: str):
+    """A Word document teachers can edit, one section after another with a page break between them."""
+    if docx is None:
+        raise RuntimeError("DOCX output needs python-docx: pip install python-docx")
+    document = docx.Document()
+    for i, section in enumerate(model["sections"]):
+        if i:
+            document.add_page_break()
+        header = document.add_paragraph(f"{section['skill']}: {section['difficulty']}")
+        header.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        topic = document.add_paragraph()
+        topic.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        topic.add_run(section["topic"]).font.size = Pt(18)
+        for block in section["blocks"]:
+            _add_docx_block(document, block)
+    document.save(fp)
+
+
+# Format -> (file extension, renderer called as renderer(model, fp))
+RENDERERS = {
+    "pdf": (".pdf", render_pdf),
+    "docx": (".docx", render_docx),
+    "html": (".html", render_html),
+}
+
+
+def register_renderer(name: str, extension: str, renderer):
+    """
+    Add an output format. The renderer is called as renderer(model, fp) and should raise if it fails.
+    export_document and batch_generate pass the renderer itself to their workers, so a registered
+    format also renders in a process pool as long as the renderer is a module-level function of an
+    importable module.
+    """
+    RENDERERS[name] = (extension, renderer)
+
+
+def export_path(fp: str, fmt: str) -> str:
+    """
+    The path of a document in the given format, e.g. batch_output/food.html for batch_output/food.pdf.
+    """
+    return os.path.splitext(fp)[0] + RENDERERS[fmt][0]
+
+
+def render_format(fmt: str, model: dict, fp: str, renderer=None) -> dict:
+    """
+    Render a document model in one format, so it can run in a ProcessPoolExecutor worker.
+    Callers submitting to a process pool should pass the renderer, as a worker started with the
+    spawn method re-imports this module and only knows the formats registered at import time.
+
+    Returns:
+        dict: The output path, the format, whether it was saved, the render time in seconds and any error
+    """
+    start = time.perf_counter()
+    result = {"fp": fp, "format": fmt, "ok": True, "error": None}
+    try:
+        (renderer or RENDERERS[fmt][1])(model, fp)
+    except Exception as e:
+        result.update(ok=False, error=f"{type(e).__name__}: {e}")
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def export_document(model: dict, fp: str, formats: list = ("pdf",), executor=None) -> list:
+    """
+    Render a document model in every given format. The renderers are CPU-bound and hold the GIL, so
+    the formats only render at the same time when a ProcessPoolExecutor is given; without one they
+    render one after another in the calling thread.
+
+    Args:
+        model (dict): From BritishCouncilFinalDocument.to_document_model
+        fp (str): Path of the document; each format replaces its extension
+        formats (list): Names of formats in RENDERERS
+        executor (Executor, optional): Pool to render in, e.g. a shared ProcessPoolExecutor
+
+    Returns:
+        list: One render_format result per format, in the order given; empty if formats is empty
+
+    Raises:
+        ValueError: If a format has no renderer
+    """
+    unknown = [fmt for fmt in formats if fmt not in RENDERERS]
+    if unknown:
+        raise ValueError(f"No renderer for {', '.join(unknown)}; available formats: {', '.join(sorted(RENDERERS))}")
+    if executor is None:
+        return [render_format(fmt, model, export_path(fp, fmt)) for fmt in formats]
+    futures = [executor.submit(render_format, fmt, model, export_path(fp, fmt), RENDERERS[fmt][1]) for fmt in formats]
+    return [future.result() for future in futures]
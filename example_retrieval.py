@@ -0,0 +1,134 @@
+"""
+Local retrieval index over the parsed British Council resources.
+Given a topic, skill and CEFR level it returns the closest existing tasks using BM25, so they can
+be used as few-shot examples in generation prompts. Everything runs locally with no network access.
+
+Example:
+    python example_retrieval.py "Booking a hotel room" --skill Reading --level A2
+"""
+import argparse
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "to", "in", "on", "for", "at", "by", "with", "is", "are",
+    "be", "it", "as", "or", "from", "that", "this", "your", "you", "about",
+}
+
+
+def tokenize(text: str) -> list:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class ExampleRetriever:
+    def __init__(self, records: list, k1: float = 1.5, b: float = 0.75, title_weight: int = 3):
+        """
+        Build the BM25 index.
+
+        Args:
+            records (list): Records as produced by corpus_ingest / ExtractionIndex
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 length normalisation
+            title_weight (int): How many times the title is counted, as it describes the topic best
+        """
+        self.records = [record for record in records if not record.get("error") and record.get("sections")]
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc_id, term frequency)]
+        self.doc_lengths = []
+        for doc_id, record in enumerate(self.records):
+            text = " ".join([(record.get("title") or "")] * title_weight + list(record["sections"].values()))
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((doc_id, tf))
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    @classmethod
+    def from_jsonl(cls, path: str = "corpus.jsonl", **kwargs) -> "ExampleRetriever":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()], **kwargs)
+
+    @classmethod
+    def from_index(cls, db_path: str = "extraction_index.sqlite", **kwargs) -> "ExampleRetriever":
+        from extraction_index import ExtractionIndex
+        with ExtractionIndex(db_path) as index:
+            return cls(index.records(), **kwargs)
+
+    def _idf(self, term: str) -> float:
+        n = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.records) - n + 0.5) / (n + 0.5))
+
+    def search(self, topic: str, skill: str = None, level: str = None, k: int = 3, section: str = None) -> list:
+        """
+        Find the existing tasks closest to a topic.
+        Documents of the same skill and level are preferred over others with a similar score.
+
+        Args:
+            topic (str): The topic to generate content on
+            skill (str, optional): "Reading", "Writing", "Speaking" or "Listening"
+            level (str, optional): CEFR level, e.g. "A2"
+            k (int): Number of results to return
+            section (str, optional): Only return documents that have this section, e.g. "Preparation Task"
+
+        Returns:
+            list: (score, record) tuples, best first
+        """
+        scores = defaultdict(float)
+        for term in set(tokenize(topic)):
+            idf = self._idf(term)
+            for doc_id, tf in self.postings.get(term, ()):
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        for doc_id in range(len(self.records)):
+            record = self.records[doc_id]
+            if section and not record["sections"].get(section):
+                scores.pop(doc_id, None)
+                continue
+            bonus = 0.0
+            if skill and record.get("skill") == skill:
+                bonus += 0.5
+            if level and record.get("level") == level:
+                bonus += 0.5
+            if bonus and (doc_id in scores or not scores):
+                scores[doc_id] += bonus
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.records[doc_id]) for doc_id, score in ranked]
+
+    def format_examples(self, topic: str, section: str, skill: str = None, level: str = None, k: int = 1, max_chars: int = 1500) -> str:
+        """
+        Format the closest existing tasks' section as a few-shot example block for a prompt.
+
+        Returns:
+            str: The example block, or an empty string if nothing relevant was found
+        """
+        results = self.search(topic, skill=skill, level=level, k=k, section=section)
+        blocks = []
+        for _, record in results:
+            text = record["sections"][section][:max_chars]
+            blocks.append(f'Existing {section.lower()} on "{record.get("title")}" ({record.get("skill")} {record.get("level")}):\n{text}')
+        return "\n\n".join(blocks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the existing resources closest to a topic.")
+    parser.add_argument("topic", help="Topic to search for")
+    parser.add_argument("--skill", default=None)
+    parser.add_argument("--level", default=None)
+    parser.add_argument("-k", type=int, default=3, help="Number of results")
+    parser.add_argument("--db", default="extraction_index.sqlite", help="Extraction index to search")
+    args = parser.parse_args(argv)
+
+    retriever = ExampleRetriever.from_index(args.db)
+    for score, record in retriever.search(args.topic, skill=args.skill, level=args.level, k=args.k):
+        print(f"{score:6.2f}  {record.get('skill')} {record.get('level')}  {record.get('title')}  ({record['path']})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,162 @@
+"""
+Persistent, incremental index of the records extracted from the resources/ PDF library.
+Each document is keyed by path, size, mtime and content hash, so a refresh only re-extracts
+files that were added or changed and drops files that were deleted. Documents whose extraction
+failed are not stored, so the next refresh tries them again.
+
+Example:
+    python extraction_index.py resources --db extraction_index.sqlite --export corpus.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from corpus_ingest import find_pdfs, ingest_corpus
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionIndex:
+    def __init__(self, db_path: str = "extraction_index.sqlite"):
+        """
+        Open (or create) the index.
+
+        Args:
+            db_path (str): Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT NOT NULL,
+                record TEXT NOT NULL,
+                indexed REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def refresh(self, root: str = "resources", workers: int = None) -> dict:
+        """
+        Bring the index up to date with the PDFs under root.
+        Files whose size and mtime are unchanged are skipped without being read. Files whose
+        size or mtime changed are hashed, and only re-extracted if their content changed.
+        Paths are stored normalised, so "./resources" and "resources" refresh the same documents.
+
+        Returns:
+            dict: Counts of "added", "changed", "unchanged", "removed" and "failed" documents
+        """
+        summary = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        known = {}  # normalised path -> (stored path, size, mtime, sha256, extraction failed)
+        for path, size, mtime, sha256, error in self.conn.execute(
+                "SELECT path, size, mtime, sha256, json_extract(record, '$.error') FROM documents"):
+            known[os.path.normpath(path)] = (path, size, mtime, sha256, error is not None)
+
+        pdf_paths = [os.path.normpath(path) for path in find_pdfs(root)]
+        to_extract = {}  # path -> (size, mtime, sha256)
+        for path in pdf_paths:
+            stat = os.stat(path)
+            previous = known.get(path)
+            if previous and previous[4]:
+                previous = None  # Stored by an older version despite failing; always extract again
+            if previous and previous[1] == stat.st_size and previous[2] == stat.st_mtime:
+                if previous[0] != path:
+                    # Stored by an older version under a path that was not normalised
+                    self.conn.execute("UPDATE documents SET path = ? WHERE path = ?", (path, previous[0]))
+                summary["unchanged"] += 1
+                continue
+            sha256 = file_sha256(path)
+            if previous and previous[3] == sha256:
+                # Touched but not modified: just record the new mtime
+                self.conn.execute("UPDATE documents SET path = ?, size = ?, mtime = ? WHERE path = ?",
+                                  (path, stat.st_size, stat.st_mtime, previous[0]))
+                summary["unchanged"] += 1
+                continue
+            summary["changed" if previous else "added"] += 1
+            to_extract[path] = (stat.st_size, stat.st_mtime, sha256)
+
+        found = set(pdf_paths)
+        root_path = os.path.normpath(root)
+        root_prefix = "" if root_path == os.curdir else os.path.join(root_path, "")
+        for path, (stored_path, *_) in known.items():
+            if (path.startswith(root_prefix) and path not in found) or (stored_path != path and path in to_extract):
+                # Deleted, or about to be stored again under its normalised path
+                self.conn.execute("DELETE FROM documents WHERE path = ?", (stored_path,))
+                if path not in found:
+                    summary["removed"] += 1
+
+        if to_extract:
+            records = ingest_corpus(paths=list(to_extract), workers=workers)
+            now = time.time()
+            for record in records:
+                if record["error"]:
+                    # Not stored, so a transient failure is retried on the next refresh
+                    self.conn.execute("DELETE FROM documents WHERE path = ?", (record["path"],))
+                    summary["failed"] += 1
+                    continue
+                size, mtime, sha256 = to_extract[record["path"]]
+                record["sha256"] = sha256
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO documents (path, size, mtime, sha256, record, indexed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (record["path"], size, mtime, sha256, json.dumps(record, ensure_ascii=False), now),
+                )
+        self.conn.commit()
+        return summary
+
+    def get(self, path: str) -> dict:
+        """
+        Get the record for one document, or None if it is not indexed. The path is normalised the
+        way refresh stores it, so "./resources/x.pdf" finds "resources/x.pdf".
+        """
+        row = self.conn.execute("SELECT record FROM documents WHERE path = ?", (os.path.normpath(path),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def records(self) -> list:
+        """
+        Get every indexed record, in path order.
+        """
+        return [json.loads(row[0]) for row in self.conn.execute("SELECT record FROM documents ORDER BY path")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally index the records extracted from the resource library.")
+    parser.add_argument("root", nargs="?", default="resources", help="Root folder of the resource library")
+    parser.add_argument("--db", default="extraction_index.sqlite", help="SQLite file holding the index")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--export", default=None, help="Also write every record to this JSONL file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    with ExtractionIndex(args.db) as index:
+        summary = index.refresh(args.root, workers=args.workers)
+        print(f"Index refreshed in {time.perf_counter() - start:.2f}s: "
+              f"{summary['added']} added, {summary['changed']} changed, "
+              f"{summary['unchanged']} unchanged, {summary['removed']} removed, {summary['failed']} failed")
+        if args.export:
+            with open(args.export, "w", encoding="utf-8") as f:
+                for record in index.records():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
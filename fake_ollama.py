@@ -0,0 +1,144 @@
+"""
+Local stand-in for an Ollama server, for exercising ResourceCreator, OllamaEndpointPool and the
+batch tools without a model. It answers POST /api/chat (streamed or not) with canned JSON content
+matching the requested schema, after a configurable latency.
+
+Example:
+    python fake_ollama.py --port 11500 --latency 0.5
+    python batch_generate.py manifest.csv --hosts http://localhost:11500
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_RESPONSES = {
+    "ResponsePrep": {
+        "explanation": "Matching cities with their countries.",
+        "answer": {
+            "labels": ["Cities", "Countries"],
+            "correct_pairs": {"Beijing": "China", "Buenos Aires": "Argentina", "Amsterdam": "The Netherlands",
+                              "Mexico City": "Mexico", "Seoul": "The Republic of Korea", "Moscow": "Russia"},
+        },
+    },
+    "ResponseMidTask2": {
+        "explanation": "A short email with True/False questions.",
+        "topic": "Asking for help",
+        "extract": "Dear Emily,\nI'm writing to ask for your help. I've been trying to fix my car but it's not working properly.\n"
+                   "Could you please recommend a reliable mechanic in your area?\nBest regards,\nAlex",
+        "questions": ["The writer is asking for help with car repairs", "Alex knows an experienced mechanic"],
+        "answers": [True, False],
+    },
+    "ResponseDiscussion": {
+        "explanation": "A single open question.",
+        "answer": {"question": "What activities would you like to do on a weekend trip with friends?"},
+    },
+}
+
+
+def example_from_schema(schema: dict, definitions: dict = None):
+    """Build a minimal value matching a JSON schema, for schemas without a canned response."""
+    definitions = definitions if definitions is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return example_from_schema(definitions[schema["$ref"].split("/")[-1]], definitions)
+    if schema.get("title") in CANNED_RESPONSES and "properties" in schema:
+        canned = CANNED_RESPONSES[schema["title"]]
+        return {name: canned[name] for name in schema["properties"] if name in canned}
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        return {name: example_from_schema(field, definitions) for name, field in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [example_from_schema(schema.get("items", {}), definitions)]
+    return {"string": "example", "boolean": True, "integer": 1, "number": 1.0}.get(schema_type)
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    tokens_per_second = 200.0
+    requests = 0
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass  # Keep the console quiet under load
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path in ("/", "/api/tags", "/api/version"):
+            self._send_json(200, {"models": [], "version": "fake"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self._send_json(404, {"error": "not found"})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self._lock:
+            type(self).requests += 1
+        schema = request.get("format") if isinstance(request.get("format"), dict) else {}
+        content = json.dumps(example_from_schema(schema) if schema else {})
+        prompt_chars = sum(len(message.get("content", "")) for message in request.get("messages", []))
+        time.sleep(self.latency)
+
+        base = {"model": request.get("model", "fake"), "created_at": datetime.now(timezone.utc).isoformat()}
+        final = dict(base, message={"role": "assistant", "content": ""}, done=True, done_reason="stop",
+                     total_duration=int(self.latency * 1e9), load_duration=0,
+                     prompt_eval_count=prompt_chars // 4, prompt_eval_duration=int(self.latency * 0.2 * 1e9),
+                     eval_count=len(content) // 4, eval_duration=int(self.latency * 0.8 * 1e9))
+        if not request.get("stream", True):
+            final["message"]["content"] = content
+            self._send_json(200, final)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for i in range(0, len(content), 4):  # Roughly one token per four characters
+            chunk = dict(base, message={"role": "assistant", "content": content[i:i + 4]}, done=False)
+            self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+        self.wfile.write((json.dumps(final) + "\n").encode("utf-8"))
+
+
+def start_fake_ollama(port: int = 0, latency: float = 0.0, tokens_per_second: float = 200.0) -> ThreadingHTTPServer:
+    """
+    Start the stub server in a background thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server; its URL is f"http://127.0.0.1:{server.server_port}". Call shutdown() to stop it.
+    """
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,),
+                   {"latency": latency, "tokens_per_second": tokens_per_second})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server returning canned responses.")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before answering each request")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Pace of streamed responses")
+    args = parser.parse_args(argv)
+
+    server = start_fake_ollama(args.port, args.latency, args.tokens_per_second)
+    print(f"Fake Ollama listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,27 +1,67 @@
 """
 Simple GUI for generating British Council language learning resources.
 Creates preparation tasks, middle tasks, and discussion sections combined into one PDF.
+Several documents can be queued; they are generated in the background, up to a configurable
+number at a time, while the window stays responsive.
 """
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tasks import PreparationTask, MiddleTask, Discussion
 from british_council_final_document import BritishCouncilFinalDocument
 from running_ollama_easy import ResourceCreator
+import itertools
+import queue
 import threading
+import time
+
+POLL_INTERVAL_MS = 100
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker thread when its job has been cancelled."""
+
+
+class GenerationJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, topic, skill, difficulty, output_name):
+        self.id = next(self._ids)
+        self.topic = topic
+        self.skill = skill
+        self.difficulty = difficulty
+        self.output_name = output_name
+        self.status = "Queued"
+        self.start_time = None
+        self.end_time = None
+        self.cancel_event = threading.Event()
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.perf_counter()) - self.start_time
+
 
 class GeneratorGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("British Council Resource Generator")
-        self.root.geometry("500x300")
+        self.root.geometry("760x520")
         
         # Variables
         self.topic_var = tk.StringVar()
         self.skill_var = tk.StringVar(value="Reading")
         self.difficulty_var = tk.StringVar(value="A1")
         self.output_name_var = tk.StringVar(value="final_document")
+        self.concurrency_var = tk.IntVar(value=2)
+
+        # Job queue state. Only the Tk main loop touches these; workers report back through self.events.
+        self.jobs = {}
+        self.pending = []
+        self.running = set()
+        self.events = queue.Queue()
         
         self.setup_ui()
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
     
     def setup_ui(self):
         # Main container
@@ -56,19 +96,38 @@ class GeneratorGUI:
         output_entry = ttk.Entry(main_frame, textvariable=self.output_name_var, width=40)
         output_entry.grid(row=4, column=1, pady=5, padx=10, sticky=(tk.W, tk.E))
         
-        # Generate button
-        self.generate_button = ttk.Button(main_frame, text="Generate PDF", 
+        # Concurrency limit
+        ttk.Label(main_frame, text="Parallel Jobs:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        concurrency_spin = ttk.Spinbox(main_frame, from_=1, to=8, textvariable=self.concurrency_var,
+                                       width=5, state="readonly")
+        concurrency_spin.grid(row=5, column=1, pady=5, padx=10, sticky=tk.W)
+
+        # Queue button
+        self.generate_button = ttk.Button(main_frame, text="Add to Queue",
                                           command=self.start_generation)
-        self.generate_button.grid(row=5, column=0, columnspan=2, pady=20)
+        self.generate_button.grid(row=6, column=0, columnspan=2, pady=10)
+
+        # Job queue panel
+        columns = ("topic", "skill", "difficulty", "output", "status", "elapsed")
+        self.job_tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=8)
+        for column, heading, width in zip(columns, ("Topic", "Skill", "Level", "Output", "Status", "Elapsed"),
+                                          (160, 70, 50, 140, 190, 60)):
+            self.job_tree.heading(column, text=heading)
+            self.job_tree.column(column, width=width, anchor=tk.W)
+        self.job_tree.grid(row=7, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        self.cancel_button = ttk.Button(main_frame, text="Cancel Selected", command=self.cancel_selected)
+        self.cancel_button.grid(row=8, column=0, columnspan=2, pady=10)
         
         # Progress label
         self.progress_label = ttk.Label(main_frame, text="", foreground="blue")
-        self.progress_label.grid(row=6, column=0, columnspan=2, pady=10)
+        self.progress_label.grid(row=9, column=0, columnspan=2, pady=5)
         
         # Configure grid weights for resizing
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
+        main_frame.rowconfigure(7, weight=1)
     
     def validate_inputs(self):
         """Validate user inputs."""
@@ -82,38 +141,19 @@ class GeneratorGUI:
         
         return True
     
-    def generate_task(self):
-        """Generate the PDF task in a separate thread to prevent UI freezing."""
+    def generate_task(self, job):
+        """Generate the PDF for one job. Runs in a worker thread, so it only reports back through self.events."""
         try:
-            # Update progress
-            self.progress_label.config(text="Initializing...")
-            
-            # Get user inputs
-            topic = self.topic_var.get().strip()
-            skill = self.skill_var.get()
-            difficulty = self.difficulty_var.get()
-            output_name = self.output_name_var.get().strip()
-            
-            # Add .pdf extension if not present
-            if not output_name.endswith('.pdf'):
-                output_name += '.pdf'
-            
-            # Create resource creator
-            self.progress_label.config(text="Connecting to AI...")
-            creator = ResourceCreator(topic=topic)
+            self.events.put(("status", job.id, "Connecting to AI..."))
+            creator = ResourceCreator(topic=job.topic, difficulty=job.difficulty, skill=job.skill, stream=True,
+                                      on_progress=lambda progress: self.report_stream_progress(job, progress))
             
             # Create task objects
-            self.progress_label.config(text="Creating preparation task...")
-            preptask = PreparationTask(skill=skill, difficulty=difficulty, topic=topic)
-            
-            self.progress_label.config(text="Creating middle task...")
-            midtask = MiddleTask(skill=skill, difficulty=difficulty, topic=topic, task_types=["tf"])
-            
-            self.progress_label.config(text="Creating discussion task...")
-            discussion = Discussion(topic=topic)
+            preptask = PreparationTask(skill=job.skill, difficulty=job.difficulty, topic=job.topic)
+            midtask = MiddleTask(skill=job.skill, difficulty=job.difficulty, topic=job.topic, task_types=["tf"])
+            discussion = Discussion(topic=job.topic)
             
             # Create final document
-            self.progress_label.config(text="Generating final document...")
             example_doc = BritishCouncilFinalDocument(
                 preparation_task=preptask,
                 middle_task=midtask,
@@ -122,32 +162,111 @@ class GeneratorGUI:
             )
             
             # Generate PDF
-            self.progress_label.config(text="Compiling PDF...")
-            example_doc.generate_final_document(fp=output_name)
-            
-            # Success message
-            self.progress_label.config(text="✓ PDF generated successfully!", foreground="green")
-            messagebox.showinfo("Success", f"PDF generated successfully as '{output_name}'")
-            
-            # Reset button state
-            self.generate_button.config(state="normal")
+            self.events.put(("status", job.id, "Generating content..."))
+            if not example_doc.generate_final_document(fp=job.output_name):
+                raise RuntimeError("The document could not be saved.")
+            if job.cancel_event.is_set():
+                raise JobCancelled()
+            self.events.put(("done", job.id, job.output_name))
             
+        except JobCancelled:
+            self.events.put(("cancelled", job.id, None))
         except Exception as e:
-            self.progress_label.config(text="✗ Error occurred", foreground="red")
-            messagebox.showerror("Error", f"An error occurred while generating the PDF:\n{str(e)}")
-            self.generate_button.config(state="normal")
+            if job.cancel_event.is_set():
+                self.events.put(("cancelled", job.id, None))
+            else:
+                self.events.put(("error", job.id, str(e)))
+            
+    def report_stream_progress(self, job, progress):
+        """Report progress of a streamed model response. Called from the worker thread."""
+        if job.cancel_event.is_set():
+            raise JobCancelled()  # Aborts the streamed request
+        if progress["tokens"] % 20:
+            return  # Only refresh the status every few tokens
+        fields_done = len(progress["fields_completed"])
+        text = (f"{progress['name']}: {fields_done}/{progress['fields_total']} fields, "
+                f"{progress['tokens_per_second']:.1f} tok/s")
+        self.events.put(("status", job.id, text))
     
     def start_generation(self):
-        """Start the PDF generation process in a separate thread."""
+        """Add a job for the current inputs to the queue."""
         if not self.validate_inputs():
             return
         
-        # Disable button to prevent multiple clicks
-        self.generate_button.config(state="disabled")
+        output_name = self.output_name_var.get().strip()
+        # Add .pdf extension if not present
+        if not output_name.endswith('.pdf'):
+            output_name += '.pdf'
+        
+        # Two jobs writing the same file at the same time would overwrite each other's PDF
+        active_names = {job.output_name for job in self.pending}
+        active_names.update(self.jobs[job_id].output_name for job_id in self.running)
+        if output_name in active_names:
+            messagebox.showerror("Error", f"'{output_name}' is already queued or being generated. "
+                                          "Please choose another output name.")
+            return
         
-        # Start generation in a separate thread
-        thread = threading.Thread(target=self.generate_task, daemon=True)
-        thread.start()
+        job = GenerationJob(self.topic_var.get().strip(), self.skill_var.get(), self.difficulty_var.get(), output_name)
+        self.jobs[job.id] = job
+        self.pending.append(job)
+        self.job_tree.insert("", tk.END, iid=str(job.id),
+                             values=(job.topic, job.skill, job.difficulty, job.output_name, job.status, ""))
+        self.dispatch_jobs()
+
+    def dispatch_jobs(self):
+        """Start queued jobs until the concurrency limit is reached."""
+        while self.pending and len(self.running) < self.concurrency_var.get():
+            job = self.pending.pop(0)
+            job.start_time = time.perf_counter()
+            self.running.add(job.id)
+            self.update_job(job, "Starting...")
+            threading.Thread(target=self.generate_task, args=(job,), daemon=True).start()
+        self.progress_label.config(text=f"{len(self.running)} running, {len(self.pending)} queued")
+
+    def cancel_selected(self):
+        """Cancel the selected jobs. Queued jobs are dropped; running jobs stop at their next progress update."""
+        for iid in self.job_tree.selection():
+            job = self.jobs[int(iid)]
+            if job in self.pending:
+                self.pending.remove(job)
+                self.update_job(job, "Cancelled")
+            elif job.id in self.running:
+                job.cancel_event.set()
+                self.update_job(job, "Cancelling...")
+        self.dispatch_jobs()
+
+    def update_job(self, job, status=None):
+        if status is not None:
+            job.status = status
+        elapsed = f"{job.elapsed():.0f}s" if job.start_time is not None else ""
+        self.job_tree.item(str(job.id), values=(job.topic, job.skill, job.difficulty, job.output_name, job.status, elapsed))
+
+    def poll_events(self):
+        """Apply the events posted by worker threads. Runs on the Tk main loop."""
+        try:
+            while True:
+                kind, job_id, payload = self.events.get_nowait()
+                job = self.jobs[job_id]
+                if kind == "status":
+                    if not job.cancel_event.is_set():
+                        self.update_job(job, payload)
+                    continue
+                job.end_time = time.perf_counter()
+                self.running.discard(job_id)
+                if kind == "done":
+                    self.update_job(job, "✓ Done")
+                elif kind == "cancelled":
+                    self.update_job(job, "Cancelled")
+                else:
+                    self.update_job(job, "✗ Error")
+                    messagebox.showerror("Error", f"An error occurred while generating '{job.output_name}':\n{payload}")
+                self.dispatch_jobs()
+        except queue.Empty:
+            pass
+
+        for job_id in self.running:
+            self.update_job(self.jobs[job_id])
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
 
 def main():
     root = tk.Tk()
@@ -156,4 +275,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,128 @@
+"""
+Page-lazy text extraction for PDFs.
+Instead of joining get_text() for every page up front, pages are read one at a time and reading
+stops as soon as the markers a parser needs have all been seen, so a long resource whose sections
+are at the start is never extracted in full. The document is opened by path, so MuPDF reads objects
+from the file on demand rather than loading the whole file into memory.
+
+Example:
+    with LazyPDFText(path) as pdf_text:
+        text = pdf_text.read_until(MarkerSequence(("Preparation task", "Reading text:")))
+"""
+from typing import NamedTuple
+import fitz  # PyMuPDF
+
+
+class MarkerSequence(NamedTuple):
+    """Strings that must all appear in the text, in this order, e.g. the start and end of a section."""
+    markers: tuple
+    ignore_case: bool = False
+
+
+class _MarkerProgress:
+    """Tracks how much of a MarkerSequence has been found, looking only at newly read text."""
+
+    def __init__(self, sequence: MarkerSequence):
+        self.markers = [marker.lower() for marker in sequence.markers] if sequence.ignore_case else list(sequence.markers)
+        self.ignore_case = sequence.ignore_case
+        self.found = 0
+        self.carry = ""  # End of the text read so far, in case a marker spans two chunks
+        self.overlap = max(len(marker) for marker in self.markers) - 1
+
+    @property
+    def done(self) -> bool:
+        return self.found == len(self.markers)
+
+    def feed(self, chunk: str):
+        text = self.carry + (chunk.lower() if self.ignore_case else chunk)
+        position = 0
+        while not self.done:
+            index = text.find(self.markers[self.found], position)
+            if index == -1:
+                break
+            position = index + len(self.markers[self.found])
+            self.found += 1
+        self.carry = text[max(position, len(text) - self.overlap):] if self.overlap else ""
+
+
+class LazyPDFText:
+    def __init__(self, path: str, separator: str = "\n"):
+        """
+        Args:
+            path (str): Path to the PDF
+            separator (str): Inserted between pages, as in separator.join(page.get_text() for page in doc)
+        """
+        self.path = path
+        self.separator = separator
+        self.doc = fitz.open(path)
+        self.page_count = self.doc.page_count
+        self.parts = []
+
+    def close(self):
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def pages_read(self) -> int:
+        return len(self.parts)
+
+    @property
+    def complete(self) -> bool:
+        """True once every page has been read."""
+        return self.pages_read == self.page_count
+
+    @property
+    def text(self) -> str:
+        """The text of the pages read so far."""
+        return self.separator.join(self.parts)
+
+    def iter_pages(self):
+        """
+        Yield the text of each page not read yet, reading it only when asked for.
+        """
+        while not self.complete:
+            page = self.doc.load_page(self.pages_read)
+            self.parts.append(page.get_text())
+            yield self.parts[-1]
+        self.close()  # Everything has been read
+
+    def read_until(self, *sequences: MarkerSequence) -> str:
+        """
+        Read pages until every marker sequence has been found, or the document ends.
+        Each page is searched once, as it is read.
+
+        Returns:
+            str: The text read so far. Check complete to see whether the whole document was read.
+        """
+        progress = [_MarkerProgress(sequence) for sequence in sequences]
+        if self.parts:
+            for state in progress:
+                state.feed(self.text)
+        pages = self.iter_pages()
+        while not all(state.done for state in progress):
+            page_text = next(pages, None)
+            if page_text is None:
+                break
+            chunk = self.separator + page_text if self.pages_read > 1 else page_text
+            for state in progress:
+                if not state.done:
+                    state.feed(chunk)
+        return self.text
+
+    def read_all(self) -> str:
+        """
+        Read the remaining pages.
+
+        Returns:
+            str: The text of the whole document
+        """
+        for _ in self.iter_pages():
+            pass
+        return self.text
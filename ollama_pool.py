@@ -0,0 +1,122 @@
+"""
+Pool of Ollama endpoints for spreading model requests over several inference servers.
+Each endpoint keeps one ollama.Client, so HTTP connections are reused between requests. Requests
+go to the healthy endpoint with the least outstanding work, and an endpoint that times out or
+refuses connections is taken out of rotation for a cooldown period. While every endpoint is
+cooling down, requests go to the one whose cooldown ends soonest rather than failing outright, so
+a pool of one host behaves like a plain client.
+
+Example:
+    pool = OllamaEndpointPool(["http://localhost:11434", "http://gpu-box:11434"])
+    creator = ResourceCreator(topic="Asking for help", endpoints=pool)
+"""
+import threading
+import time
+import httpx
+from ollama import Client
+
+
+class NoHealthyEndpointError(ConnectionError):
+    """Raised when every endpoint in the pool has already been tried for a request."""
+
+
+class Endpoint:
+    def __init__(self, host: str, timeout: float):
+        self.host = host
+        self.client = Client(host=host, timeout=timeout)
+        self.outstanding = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def __repr__(self):
+        return f"Endpoint(host='{self.host}', outstanding={self.outstanding}, requests={self.requests}, failures={self.failures})"
+
+
+class OllamaEndpointPool:
+    def __init__(self, hosts: list, timeout: float = 300.0, cooldown: float = 30.0):
+        """
+        Args:
+            hosts (list): Ollama base URLs, e.g. ["http://localhost:11434", "http://localhost:11435"]
+            timeout (float): Seconds before a request to an endpoint is considered timed out
+            cooldown (float): Seconds a failing endpoint is kept out of rotation
+        """
+        if not hosts:
+            raise ValueError("At least one Ollama host is required")
+        self.endpoints = [Endpoint(host, timeout) for host in hosts]
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    def _acquire(self, exclude: set) -> Endpoint:
+        """
+        Pick the healthy endpoint with the least outstanding requests and reserve a slot on it. If every
+        endpoint not yet tried is cooling down, the one that comes back soonest is picked instead.
+        """
+        with self._lock:
+            now = time.monotonic()
+            untried = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+            if not untried:
+                raise NoHealthyEndpointError(f"No Ollama endpoint left to try: {self.endpoints}")
+            candidates = [endpoint for endpoint in untried if endpoint.healthy(now)]
+            if candidates:
+                endpoint = min(candidates, key=lambda candidate: (candidate.outstanding, candidate.requests))
+            else:
+                endpoint = min(untried, key=lambda candidate: candidate.down_until)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: Endpoint, failed: bool = False):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if failed:
+                endpoint.failures += 1
+                endpoint.down_until = time.monotonic() + self.cooldown
+                print(f"WARNING: Ollama endpoint {endpoint.host} failed, out of rotation for {self.cooldown:.0f}s")
+
+    def chat(self, **kwargs):
+        """
+        Same arguments as ollama.chat. A request that fails to connect or times out is retried on
+        the next endpoint. Streamed requests keep their endpoint reserved until the stream is exhausted or closed.
+        """
+        tried = set()
+        while True:
+            endpoint = self._acquire(tried)
+            tried.add(endpoint)
+            try:
+                response = endpoint.client.chat(**kwargs)
+                if kwargs.get("stream"):
+                    # Streams only connect when iterated; pull the first chunk so connection errors can be retried
+                    first_chunk = next(response, None)
+            except (httpx.TimeoutException, httpx.TransportError, ConnectionError):
+                self._release(endpoint, failed=True)
+                if len(tried) == len(self.endpoints):
+                    raise
+                continue
+            except Exception:
+                self._release(endpoint)
+                raise
+            if kwargs.get("stream"):
+                return self._stream(endpoint, first_chunk, response)
+            self._release(endpoint)
+            return response
+
+    def _stream(self, endpoint: Endpoint, first_chunk, response_stream):
+        failed = False
+        try:
+            if first_chunk is not None:
+                yield first_chunk
+            yield from response_stream
+        except (httpx.TimeoutException, httpx.TransportError, ConnectionError):
+            failed = True
+            raise
+        finally:
+            self._release(endpoint, failed=failed)
+
+    def stats(self) -> list:
+        with self._lock:
+            return [{"host": endpoint.host, "requests": endpoint.requests, "failures": endpoint.failures,
+                     "outstanding": endpoint.outstanding} for endpoint in self.endpoints]
@@ -1,9 +1,3 @@
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-import os
-import sys
-import fitz  # PyMuPDF
-
 """
 PDF Hyperlink Adder Script
 
@@ -11,19 +5,41 @@ This script processes PDF files to add hyperlinks to specific keywords found wit
 The main functionality includes:
 
 1. PDF Generation: Creates sample PDFs with target keywords embedded in the text
-2. Hyperlink Addition: Finds the first instance of a specified keyword in a PDF and adds a hyperlink to it
-3. Batch Processing: Processes entire folders of PDFs to add hyperlinks to keywords
-4. Filename Parsing: Extracts skill level and topic information from PDF filenames
+2. Hyperlink Addition: Finds the first instance of each keyword in a PDF and adds a hyperlink to it
+3. Batch Processing: Processes entire folders of PDFs in a process pool
+4. Filename Parsing: Extracts skill, level and topic information from PDF filenames
 
 Key Functions:
 - generate_sample_pdf(): Creates a basic PDF with a target keyword
 - add_link_to_keyword(): Adds a hyperlink to the first instance of a keyword in a PDF
 - parse_filename(): Extracts skill level and topic from structured filenames
+- link_pdf(): Links every keyword of a keyword -> URL template mapping in one pass over each page
+- link_library(): Runs link_pdf over whole folders in parallel
 
 The script is designed to work with educational PDFs that follow a naming convention
 like "LearnEnglish-Skill-Level-Topic.pdf" and can add hyperlinks to enhance
-interactive learning materials.
+interactive learning materials. URL templates may use {skill}, {level} and {topic} from the filename.
+
+Example:
+    python pdf_hyperlink_adder_to_text.py resources/Speaking resources/Writing resources/Reading --workers 8
+    python pdf_hyperlink_adder_to_text.py resources/Speaking --link "video=https://example.org/{level}/{topic}" --in-place
 """
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+import argparse
+import os
+import shutil
+import string
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+
+DEFAULT_LINK_RULES = {
+    "video": "https://learnenglish.britishcouncil.org/skills/{skill}/{level}-{skill}/{topic}",
+}
+OUTPUT_SUFFIX = "_modified"
+WORD_PUNCTUATION = string.punctuation + "“”‘’…–—"
 
 
 # Step 1: Generate a basic PDF with the target keyword
@@ -55,8 +71,8 @@ def add_link_to_keyword(pdf_path, output_path, keyword, url):
     if found:
         print(f'✅ Added link to "{keyword}" in: {os.path.basename(pdf_path)}')
     else:
-        print(f'⚠️ Keyword not found in: {os.path.basename(pdf_path)}')  
-        
+        print(f'⚠️ Keyword not found in: {os.path.basename(pdf_path)}')
+
 def parse_filename(filename):
     # Extract the keyword from the filename
     base_name = os.path.splitext(filename)[0]
@@ -66,31 +82,185 @@ def parse_filename(filename):
         assert parts[1].lower() in ['speaking', 'listening', 'reading', 'writing'], "Invalid skill in filename"
         return (parts[2], "-".join(parts[3:]).lower())  # Assuming the keyword is the fourth part
     return None
-        
-# Step 3: Process a folder of PDFs and add links to the specified keyword
-folder_path = "resources/Speaking"
-keyword = "video"
-output_folder = "resources/Speaking_modified"
-
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
-for filename in os.listdir(folder_path):
-    if filename.endswith('.pdf'):
-        pdf_path = os.path.join(folder_path, filename)
-        output_path = os.path.join(output_folder, filename)
-
-        print(f'Processing file: {filename}')
-        filename_keywords = parse_filename(filename)
-        print(f"current keywords: {filename_keywords}")
-        level = filename_keywords[0] if filename_keywords else None
-        topic = filename_keywords[1] if filename_keywords else None
-        if not level or not keyword:
-            print(f"Skipping file {filename} due to missing level or keyword.")
-            continue
-        url_to_add = f"https://learnenglish.britishcouncil.org/skills/speaking/{level}-speaking/{topic}"
-        print(f'Adding link to keyword "{keyword}" in {filename} with URL: {url_to_add}')
-        add_link_to_keyword(pdf_path, output_path, keyword, url_to_add)
-
-        # add_link_to_keyword(pdf_path, output_path, keyword, url)
-    else:
-        print(f'Skipping non-PDF file: {filename}')
+
+
+def link_fields(filename):
+    """
+    The values URL templates can use for a file: skill, level and topic, or None if the filename
+    does not follow the LearnEnglish-Skill-Level-Topic.pdf convention.
+    """
+    try:
+        parsed = parse_filename(os.path.basename(filename))
+    except AssertionError:
+        return None
+    if parsed is None:
+        return None
+    level, topic = parsed
+    return {"skill": os.path.basename(filename).split('-')[1].lower(), "level": level, "topic": topic}
+
+
+def normalise_word(word):
+    return word.strip(WORD_PUNCTUATION).lower()
+
+
+def find_keywords(page, keywords):
+    """
+    Find every keyword on a page with a single pass over its extracted words.
+    Keywords may be several words long; matching ignores case and surrounding punctuation.
+
+    Args:
+        page (fitz.Page): The page to search
+        keywords (iterable): Keywords to look for
+
+    Returns:
+        dict: keyword -> list of fitz.Rect, one per occurrence, in reading order
+    """
+    # Index the keywords by their first word, so each word on the page is looked up once
+    phrases = {}
+    for keyword in keywords:
+        tokens = [normalise_word(token) for token in keyword.split()]
+        phrases.setdefault(tokens[0], []).append((keyword, tokens))
+
+    words = page.get_text("words", sort=True)  # (x0, y0, x1, y1, word, block, line, word_no)
+    normalised = [normalise_word(word[4]) for word in words]
+    matches = {}
+    for i, token in enumerate(normalised):
+        for keyword, tokens in phrases.get(token, ()):
+            if normalised[i:i + len(tokens)] == tokens:
+                rect = fitz.Rect(words[i][:4])
+                for word in words[i + 1:i + len(tokens)]:
+                    rect |= fitz.Rect(word[:4])
+                matches.setdefault(keyword, []).append(rect)
+    return matches
+
+
+def link_pdf(pdf_path, output_path=None, link_rules=None, first_only=True):
+    """
+    Add a hyperlink to the keywords of link_rules in one PDF.
+    The links are appended with an incremental save, so the original content is not rewritten:
+    a separate output_path starts as a byte copy of pdf_path.
+
+    Args:
+        pdf_path (str): The PDF to link
+        output_path (str, optional): Where to write the linked PDF. Links pdf_path in place if None.
+        link_rules (dict, optional): keyword -> URL template using {skill}, {level} and {topic}. Defaults to DEFAULT_LINK_RULES.
+        first_only (bool): Link only the first occurrence of each keyword in the document, like add_link_to_keyword
+
+    Returns:
+        dict: The paths, links added per keyword, skipped keywords and any error. Errors are recorded
+        rather than raised, so one bad file does not stop a batch.
+    """
+    link_rules = DEFAULT_LINK_RULES if link_rules is None else link_rules
+    output_path = pdf_path if output_path is None else output_path
+    result = {"path": pdf_path, "output": output_path, "links": {}, "skipped": [], "error": None}
+    start = time.perf_counter()
+    try:
+        fields = link_fields(pdf_path) or {}
+        urls = {}
+        for keyword, template in link_rules.items():
+            try:
+                urls[keyword] = template.format(**fields)
+            except KeyError:
+                result["skipped"].append(keyword)  # The filename does not provide what the template needs
+        if urls:
+            if os.path.abspath(output_path) != os.path.abspath(pdf_path):
+                os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+                shutil.copyfile(pdf_path, output_path)
+            rewritten = False
+            with fitz.open(output_path) as doc:
+                remaining = set(urls)
+                for page in doc:
+                    if not remaining:
+                        break
+                    for keyword, rects in find_keywords(page, remaining).items():
+                        for rect in rects[:1] if first_only else rects:
+                            page.insert_link({"from": rect, "uri": urls[keyword], "kind": fitz.LINK_URI})
+                            result["links"][keyword] = result["links"].get(keyword, 0) + 1
+                        if first_only:
+                            remaining.discard(keyword)
+                if result["links"]:
+                    if doc.can_save_incrementally():
+                        doc.saveIncr()
+                    else:  # e.g. a repaired PDF; fall back to a full rewrite
+                        doc.save(output_path + ".tmp")
+                        rewritten = True
+            if rewritten:
+                os.replace(output_path + ".tmp", output_path)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def _link_job(job):
+    return link_pdf(*job)
+
+
+def find_library_pdfs(folders):
+    """
+    Every PDF under the given folders, in a stable order, leaving out earlier *_modified output folders.
+    """
+    pdf_paths = []
+    for folder in folders:
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames[:] = sorted(name for name in dirnames if not name.endswith(OUTPUT_SUFFIX))
+            pdf_paths.extend(os.path.join(dirpath, name) for name in sorted(filenames) if name.lower().endswith(".pdf"))
+    return pdf_paths
+
+
+def link_library(folders, link_rules=None, in_place=False, workers=None, first_only=True):
+    """
+    Link every PDF under the given folders with a process pool.
+    Unless in_place is True, the linked copy of folder/x.pdf is written to folder_modified/x.pdf.
+
+    Returns:
+        list: One link_pdf result per file, in path order
+    """
+    jobs = []
+    for folder in folders:
+        folder = os.path.normpath(folder)
+        for pdf_path in find_library_pdfs([folder]):
+            output_path = pdf_path if in_place else os.path.join(folder + OUTPUT_SUFFIX, os.path.relpath(pdf_path, folder))
+            jobs.append((pdf_path, output_path, link_rules, first_only))
+    if not jobs:
+        return []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Small chunks keep the workers balanced, as the PDFs vary a lot in size
+        return list(executor.map(_link_job, jobs, chunksize=4))
+
+
+def parse_link_rule(text):
+    keyword, separator, template = text.partition("=")
+    if not separator or not keyword.strip() or not template.strip():
+        raise argparse.ArgumentTypeError(f'Expected KEYWORD=URL_TEMPLATE, got "{text}"')
+    return keyword.strip(), template.strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add hyperlinks to keywords in every PDF of the given folders.")
+    parser.add_argument("folders", nargs="*", default=["resources/Speaking"], help="Folders of PDFs to link")
+    parser.add_argument("--link", type=parse_link_rule, action="append", default=None, metavar="KEYWORD=URL_TEMPLATE",
+                        help="Keyword and URL template using {skill}, {level} and {topic}; repeat for several keywords")
+    parser.add_argument("--in-place", action="store_true", help="Link the PDFs in place instead of writing *_modified folders")
+    parser.add_argument("--all", action="store_true", help="Link every occurrence of a keyword, not just the first")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    link_rules = dict(args.link) if args.link else None
+    results = link_library(args.folders, link_rules, in_place=args.in_place, workers=args.workers, first_only=not args.all)
+    for result in results:
+        name = os.path.basename(result["path"])
+        if result["error"]:
+            print(f'❌ {name}: {result["error"]}')
+        elif result["links"]:
+            print(f'✅ Added link(s) {result["links"]} in: {name}')
+        else:
+            print(f'⚠️ Keyword not found in: {name}')
+    failed = sum(1 for result in results if result["error"])
+    print(f"Linked {len(results)} file(s) ({failed} failed) in {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,14 @@
 # Re-run the extraction pipeline on the re-uploaded file
-import fitz  # PyMuPDF
 import re
 import os
 import subprocess
 import sys
 from pprint import pprint
+from lazy_pdf_text import LazyPDFText, MarkerSequence
 
+# The preparation task is all this script needs, so reading stops once its end has been seen
+PREPARATION_TASK_MARKERS = MarkerSequence(("Preparation task", "Reading text:"))
 
-# Load the re-uploaded PDF
-pdf_path = os.getcwd() + "/resources/Reading/LearnEnglish-Reading-A1-An-airport-departures-board.pdf"
-doc = fitz.open(pdf_path)
-full_text = "\n".join([page.get_text() for page in doc])
-print(full_text[:1500])
-doc.close()
 
 # Extract title and level
 def extract_title_and_level(text):
@@ -28,37 +24,14 @@ def split_reading_pdf_sections(text):
     sections = {}
     prep_pattern = r'Preparation task(.*?)Reading text:'
     prep_match = re.search(prep_pattern, text, re.DOTALL)
-    # add some preprocessing to remove the confusingly fitted headings
-    processed_output = prep_match.group(1).strip()
-    processed_output = processed_output.replace("Cities", "")
-    processed_output = processed_output.replace("Countries", "")
     if prep_match:
+        # add some preprocessing to remove the confusingly fitted headings
+        processed_output = prep_match.group(1).strip()
+        processed_output = processed_output.replace("Cities", "")
+        processed_output = processed_output.replace("Countries", "")
         sections["Preparation Task"] = processed_output
     return sections
 
-# Run extractions
-parsed_sections = split_reading_pdf_sections(full_text)
-print("PARSED SECTION : ")
-print(parsed_sections)
-print(re.search("Cities", parsed_sections["Preparation Task"]))
-reading_level, reading_title = extract_title_and_level(full_text)
-parsed_sections["Level"] = reading_level
-parsed_sections["Title"] = reading_title
-
-# Output the specific parts we care about
-document_summary_prep_task = {
-    "Title": reading_title,
-    "Level": reading_level,
-    "Preparation Task": parsed_sections.get("Preparation Task", "")
-}
-
-# PARSING DONE BY THIS POINT
-
-pprint(f"Preparation Task: {document_summary_prep_task['Preparation Task']}")
-
-
-
-
 def generate_matching_task(document_summary):
     topic = document_summary["Title"]
     level = document_summary["Level"]
@@ -73,7 +46,7 @@ def generate_matching_task(document_summary):
     
     -----------------------
     
-    {document_summary_prep_task["Preparation Task"]}
+    {document_summary["Preparation Task"]}
 
     -----------------------
     
@@ -89,8 +62,34 @@ def generate_matching_task(document_summary):
     
     return output
 
-final_output = generate_matching_task(document_summary_prep_task)
-print("---RESPONSE---")
-print(final_output)
-
 
+if __name__ == "__main__":
+    # Load the re-uploaded PDF
+    pdf_path = os.getcwd() + "/resources/Reading/LearnEnglish-Reading-A1-An-airport-departures-board.pdf"
+    with LazyPDFText(pdf_path) as pdf_text:
+        full_text = pdf_text.read_until(PREPARATION_TASK_MARKERS)
+    print(full_text[:1500])
+
+    # Run extractions
+    parsed_sections = split_reading_pdf_sections(full_text)
+    print("PARSED SECTION : ")
+    print(parsed_sections)
+    print(re.search("Cities", parsed_sections["Preparation Task"]))
+    reading_level, reading_title = extract_title_and_level(full_text)
+    parsed_sections["Level"] = reading_level
+    parsed_sections["Title"] = reading_title
+
+    # Output the specific parts we care about
+    document_summary_prep_task = {
+        "Title": reading_title,
+        "Level": reading_level,
+        "Preparation Task": parsed_sections.get("Preparation Task", "")
+    }
+
+    # PARSING DONE BY THIS POINT
+
+    pprint(f"Preparation Task: {document_summary_prep_task['Preparation Task']}")
+
+    final_output = generate_matching_task(document_summary_prep_task)
+    print("---RESPONSE---")
+    print(final_output)
@@ -1,33 +1,64 @@
 # Re-run the extraction pipeline on the re-uploaded file
 import fitz  # PyMuPDF
+import logging
 import re
 import os
 import subprocess
 import sys
 from pprint import pprint
 
-# Load the re-uploaded PDF
-pdf_path = os.getcwd() + "/resources/Reading/LearnEnglish-Reading-A1-An-airport-departures-board.pdf"
-doc = fitz.open(pdf_path)
-full_text = "\n".join([page.get_text() for page in doc])
-print(full_text[:1500])
-doc.close()
+# Parsing diagnostics; enable with logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Extract title and level, e.g. "Reading: A1\nAn airport departures board\n"
+TITLE_PATTERN = re.compile(r'(?:Reading|Writing|Speaking|Listening):\s*([ABC]\d)\s*\n(.*?)\n')
 
-# Extract title and level
 def extract_title_and_level(text):
-    title_match = re.search(r'Reading:\s*(A\d)\s*\n(.*?)\n', text)
+    title_match = TITLE_PATTERN.search(text)
     if title_match:
         level = title_match.group(1).strip()
         title = title_match.group(2).strip()
         return level, title
     return None, None
 
+# Patterns are compiled once at import rather than on every call
+PREP_PATTERN = re.compile(r'Preparation task(.*?)Reading text:', re.DOTALL)
+ANSWER_SECTION_PATTERNS = [
+    re.compile(r'Answers(.*?)(?:©|$)', re.DOTALL | re.IGNORECASE),
+    re.compile(r'Answer(.*?)(?:©|$)', re.DOTALL | re.IGNORECASE),
+    re.compile(r'Key(.*?)(?:©|$)', re.DOTALL | re.IGNORECASE),
+    re.compile(r'(\d+\.\s*[a-h])', re.DOTALL | re.IGNORECASE),  # Direct number-letter pairs
+]
+PREP_ANSWERS_PATTERN = re.compile(r'Preparation task\s*(.*?)(?:Task|$)', re.DOTALL | re.IGNORECASE)
+ANSWER_PAIR_PATTERNS = [
+    re.compile(r'(\d+)\.\s*([a-zA-Z])'),  # 1. a, 2. b, etc.
+    re.compile(r'(\d+)\s*-\s*([a-zA-Z])'),  # 1-a, 2-b, etc.
+    re.compile(r'(\d+)\s*:\s*([a-zA-Z])'),  # 1:a, 2:b, etc.
+    re.compile(r'(\d+)\s*([a-zA-Z])'),  # 1a, 2b, etc.
+]
+# Items start a line, so the end of a sentence like "sauce." is not read as item e
+NUMBERED_ITEM_PATTERN = re.compile(r'^[ \t]*(\d+)\.\s*([^\n]+)', re.MULTILINE)
+LETTERED_ITEM_PATTERN = re.compile(r'^[ \t]*([a-z])\.\s*([^\n]+)', re.MULTILINE)
+NON_LETTER_PATTERN = re.compile(r'[^a-zA-Z\s]+')
+
+# Section headings used across the Reading, Writing, Speaking and Listening resources, optionally
+# followed by a colon and a title, as in "Reading text: An airport departures board".
+# A line is only a heading if it is set in bold or larger than the body text and consists of one of these.
+HEADING_PATTERN = re.compile(
+    r'(preparation task|reading text|writing text|transcript|task \d+|answers|answer key|'
+    r'discussion|tips?|useful (?:language|phrases)|example|worksheet)\s*(?::.*)?', re.IGNORECASE)
+SECTION_ALIASES = {"answer key": "Answers"}
+ITEM_START_PATTERN = re.compile(r'(?:\d+|[a-z])[.)]\s')
+BOLD_FLAG = 16  # Bit set in a PyMuPDF span's flags when the font is bold
+# Body text is set in 12pt. Task headings are 14pt bold, while the "Reading text:" (17pt) and
+# "Answers" (16pt) banners are regular weight, so size finds the headings bold alone misses.
+HEADING_MIN_SIZE = 13
+
 # Extract major sections
 def split_reading_pdf_sections(text):
     sections = {}
     # Extract Preparation Task
-    prep_pattern = r'Preparation task(.*?)Reading text:'
-    prep_match = re.search(prep_pattern, text, re.DOTALL)
+    prep_match = PREP_PATTERN.search(text)
     if prep_match:
         processed_output = prep_match.group(1).strip()
         processed_output = processed_output.replace("Cities", "")
@@ -35,95 +66,154 @@ def split_reading_pdf_sections(text):
         sections["Preparation Task"] = processed_output
     
     # Look for answers in the entire text - try multiple locations
-    print("DEBUG: Looking for answers in the entire PDF text...")
+    logger.debug("Looking for answers in the entire PDF text...")
     
     # Try to find answers at the end of the document
-    ans_patterns = [
-        r'Answers(.*?)(?:©|$)',
-        r'Answer(.*?)(?:©|$)',
-        r'Key(.*?)(?:©|$)',
-        r'(\d+\.\s*[a-h])',  # Direct number-letter pairs
-    ]
-    
-    for pattern in ans_patterns:
-        ans_match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+    for pattern in ANSWER_SECTION_PATTERNS:
+        ans_match = pattern.search(text)
         if ans_match:
             answers_text = ans_match.group(1).strip()
             if answers_text:  # Only use if we found actual content
                 sections["Answers"] = answers_text
-                print(f"DEBUG: Found answers with pattern '{pattern}':")
-                print(answers_text)
+                logger.debug(f"Found answers with pattern '{pattern.pattern}':")
+                logger.debug(answers_text)
                 break
     
     # If no answers found, let's print the last part of the text to see what's there
     if "Answers" not in sections:
-        print("DEBUG: No answers found with patterns. Last 500 characters of text:")
-        print(text[-500:])
+        logger.debug("No answers found with patterns. Last 500 characters of text:")
+        logger.debug(text[-500:])
     
     return sections
 
-# Run extractions
-parsed_sections = split_reading_pdf_sections(full_text)
-print("PARSED SECTIONS : ")
-print(parsed_sections)
-print("--------------------------------")
-for section in parsed_sections:
-    print(f"Section: {section}")
 
-print("--------------------------------")
+def iter_page_lines(page):
+    """
+    Yield (text, is_bold, size) for every text line of a page, where size is the largest font size on
+    the line. Lines come in the order they were written, which keeps each column of a two-column
+    answer page together; sorting by position would interleave the columns' headings and answers.
+    """
+    for block in page.get_text("dict")["blocks"]:
+        if block.get("type") != 0:
+            continue  # Images
+        for line in block["lines"]:
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if not spans:
+                continue
+            text = "".join(span["text"] for span in line["spans"])
+            is_bold = all(span["flags"] & BOLD_FLAG or "bold" in span["font"].lower() for span in spans)
+            yield text, is_bold, max(span["size"] for span in spans)
+
+
+class SectionExtractor:
+    """
+    Splits a document into its sections in a single pass over its lines, starting a new section at
+    every heading, i.e. a line naming a section that is set in bold or larger than the body text. Everything from the answers heading to the page footer is kept in one
+    "Answers" section, as the answers repeat the task headings. Bold lines inside the preparation
+    task that are not items, like "Cities" and "Countries", are its column labels.
+    """
+
+    def __init__(self):
+        self.lines = []  # Every line, for the title and the regex fallback
+        self.sections = {}  # Section name -> list of lines
+        self.labels = []
+        self.current = None
+        self.done = False  # True once the answers have ended, as nothing after them is needed
+
+    def feed_page(self, page):
+        for text, is_bold, size in iter_page_lines(page):
+            self.feed_line(text, is_bold, size)
+
+    def feed_line(self, text, is_bold, size=0):
+        self.lines.append(text)
+        stripped = text.strip()
+        if stripped.startswith("©"):
+            # Page footer
+            if self.current == "Answers":
+                self.done = True
+            return
+        heading = HEADING_PATTERN.fullmatch(stripped) if self.current != "Answers" else None
+        if heading and (is_bold or size >= HEADING_MIN_SIZE):
+            name = heading.group(1).lower()
+            self.current = SECTION_ALIASES.get(name, name.title())
+            self.sections.setdefault(self.current, [])
+            return
+        if self.current is None:
+            return  # Title block
+        if is_bold and self.current == "Preparation Task" and not ITEM_START_PATTERN.match(stripped):
+            self.labels.append(stripped)
+            return
+        self.sections[self.current].append(text)
 
-reading_level, reading_title = extract_title_and_level(full_text)
-parsed_sections["Level"] = reading_level
-parsed_sections["Title"] = reading_title
+    @property
+    def text(self):
+        return "\n".join(self.lines)
 
-document_summary_prep_task = {
-    "Title": reading_title,
-    "Level": reading_level,
-    "Preparation Task": parsed_sections.get("Preparation Task", ""),
-    "Answers": parsed_sections.get("Answers", "")
-}
+    def section_texts(self):
+        return {name: "\n".join(lines).strip() for name, lines in self.sections.items()}
 
-pprint(f"Preparation Task: {document_summary_prep_task['Preparation Task']}")
-pprint(f"Answers: {document_summary_prep_task['Answers']}")
+
+def extract_document(pdf_path):
+    """
+    Extract the title, level, every section and the preparation task's column labels of a PDF in one
+    pass, stopping after the answers. A preparation task or answers section the headings did not
+    find is taken from split_reading_pdf_sections instead.
+
+    Returns:
+        dict: "level", "title", "sections" (name -> text), "labels", "text", "pages" and "pages_read"
+    """
+    extractor = SectionExtractor()
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+        pages_read = 0
+        for page in doc:
+            extractor.feed_page(page)
+            pages_read += 1
+            if extractor.done:
+                break
+    text = extractor.text
+    sections = extractor.section_texts()
+    if not (sections.get("Preparation Task") and sections.get("Answers")):
+        for name, section_text in split_reading_pdf_sections(text).items():
+            if not sections.get(name):
+                logger.debug(f"No {name} heading found, falling back to the text patterns")
+                sections[name] = section_text
+    level, title = extract_title_and_level(text)
+    return {"level": level, "title": title, "sections": sections, "labels": extractor.labels,
+            "text": text, "pages": page_count, "pages_read": pages_read}
 
 # --- New: Parse answers into a dictionary ---
 def parse_answer_pairs(answers_text):
-    print(f"DEBUG: Parsing answers text: '{answers_text}'")
+    logger.debug(f"Parsing answers text: '{answers_text}'")
     # Only use lines between 'Preparation task' and the next 'Task' heading
     relevant = ''
-    m = re.search(r'Preparation task\s*(.*?)(?:Task|$)', answers_text, re.DOTALL | re.IGNORECASE)
+    m = PREP_ANSWERS_PATTERN.search(answers_text)
     if m:
         relevant = m.group(1)
     else:
         relevant = answers_text
-    print(f"DEBUG: Relevant answer lines: '{relevant}'")
+    logger.debug(f"Relevant answer lines: '{relevant}'")
     # Try multiple patterns for different answer formats
-    patterns = [
-        r'(\d+)\.\s*([a-zA-Z])',  # 1. a, 2. b, etc.
-        r'(\d+)\s*-\s*([a-zA-Z])',  # 1-a, 2-b, etc.
-        r'(\d+)\s*:\s*([a-zA-Z])',  # 1:a, 2:b, etc.
-        r'(\d+)\s*([a-zA-Z])',  # 1a, 2b, etc.
-    ]
-    for pattern in patterns:
-        pairs = re.findall(pattern, relevant)
+    for pattern in ANSWER_PAIR_PATTERNS:
+        pairs = pattern.findall(relevant)
         if pairs:
-            print(f"DEBUG: Found pairs with pattern '{pattern}': {pairs}")
+            logger.debug(f"Found pairs with pattern '{pattern.pattern}': {pairs}")
             answer_dict = {num: letter for num, letter in pairs}
             return answer_dict
-    print("DEBUG: No pairs found with any pattern")
+    logger.debug("No pairs found with any pattern")
     return {}
 
 def create_word_mapping_dict(prep_task_text, answer_dict):
-    print(f"DEBUG: Creating word mapping from prep task: '{prep_task_text[:200]}...'")
+    logger.debug(f"Creating word mapping from prep task: '{prep_task_text[:200]}...'")
     
     # Extract the lists from preparation task
     # Look for numbered items (1. ... 2. ... etc.)
-    numbered_items = re.findall(r'(\d+)\.\s*([^\n]+)', prep_task_text)
-    print(f"DEBUG: Numbered items found: {numbered_items}")
+    numbered_items = NUMBERED_ITEM_PATTERN.findall(prep_task_text)
+    logger.debug(f"Numbered items found: {numbered_items}")
     
     # Look for lettered items (a. ... b. ... etc.)
-    lettered_items = re.findall(r'([a-h])\.\s*([^\n]+)', prep_task_text)
-    print(f"DEBUG: Lettered items found: {lettered_items}")
+    lettered_items = LETTERED_ITEM_PATTERN.findall(prep_task_text)
+    logger.debug(f"Lettered items found: {lettered_items}")
     
     # Create mappings
     number_to_word = {num: word.strip() for num, word in numbered_items}
@@ -134,24 +224,18 @@ def create_word_mapping_dict(prep_task_text, answer_dict):
     for num, letter in answer_dict.items():
         if num in number_to_word and letter in letter_to_word:
             # Clean both key and value by removing punctuation and extra characters
-            clean_key = re.sub('[^a-zA-Z\s]+', '', number_to_word[num]).strip()
-            clean_value = re.sub('[^a-zA-Z\s]+', '', letter_to_word[letter]).strip()
+            clean_key = NON_LETTER_PATTERN.sub('', number_to_word[num]).strip()
+            clean_value = NON_LETTER_PATTERN.sub('', letter_to_word[letter]).strip()
             word_mapping[clean_key] = clean_value
     
     return word_mapping
 
-answer_dict = parse_answer_pairs(document_summary_prep_task["Answers"])
-print("---ANSWER DICTIONARY (number-letter pairs)---")
-print(answer_dict)
-
-# Create the word mapping dictionary
-word_mapping_dict = create_word_mapping_dict(document_summary_prep_task["Preparation Task"], answer_dict)
-print("---FINAL WORD MAPPING DICTIONARY---")
-print(word_mapping_dict)
-
-def generate_matching_task(document_summary):
+def generate_matching_task(document_summary, retriever=None):
     topic = document_summary["Title"]
     level = document_summary["Level"]
+    # Use the closest existing tasks as examples when an index of the resources is available
+    example = retriever.format_examples(topic, "Preparation Task", level=level, k=2) if retriever else ""
+    example = example or document_summary["Preparation Task"]
     
     prompt = f"""
     
@@ -163,7 +247,7 @@ def generate_matching_task(document_summary):
     
     -----------------------
     
-    {document_summary_prep_task["Preparation Task"]}
+    {example}
 
     -----------------------
     
@@ -180,5 +264,41 @@ def generate_matching_task(document_summary):
     return output
 
 
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    # Load the re-uploaded PDF
+    pdf_path = os.getcwd() + "/resources/Reading/LearnEnglish-Reading-A1-An-airport-departures-board.pdf"
+    document = extract_document(pdf_path)
+    full_text = document["text"]
+    print(full_text[:1500])
+
+    parsed_sections = document["sections"]
+    print("PARSED SECTIONS : ")
+    print(parsed_sections)
+    print("--------------------------------")
+    for section in parsed_sections:
+        print(f"Section: {section}")
+    print(f"Preparation task labels: {document['labels']}")
+
+    print("--------------------------------")
+
+    reading_level, reading_title = document["level"], document["title"]
+
+    document_summary_prep_task = {
+        "Title": reading_title,
+        "Level": reading_level,
+        "Preparation Task": parsed_sections.get("Preparation Task", ""),
+        "Answers": parsed_sections.get("Answers", "")
+    }
+
+    pprint(f"Preparation Task: {document_summary_prep_task['Preparation Task']}")
+    pprint(f"Answers: {document_summary_prep_task['Answers']}")
 
+    answer_dict = parse_answer_pairs(document_summary_prep_task["Answers"])
+    print("---ANSWER DICTIONARY (number-letter pairs)---")
+    print(answer_dict)
 
+    # Create the word mapping dictionary
+    word_mapping_dict = create_word_mapping_dict(document_summary_prep_task["Preparation Task"], answer_dict)
+    print("---FINAL WORD MAPPING DICTIONARY---")
+    print(word_mapping_dict)
@@ -0,0 +1,52 @@
+"""
+On-disk cache of rendered PDFs.
+Entries are keyed by the hash of the rendered content, the layout TEMPLATE_VERSION and the seeds
+used for randomised layout, which together determine the rendered bytes exactly. A section render
+has one seed; a whole-document render (BritishCouncilFinalDocument.render_document) has the list of
+its sections' seeds. Regenerating a document whose content has not changed therefore reuses the
+finished PDF instead of laying it out again.
+"""
+import hashlib
+import json
+from typing import Union
+from response_cache import ResponseCache
+
+
+class RenderCache(ResponseCache):
+    extension = ".pdf"
+
+    def __init__(self, cache_dir: str = ".render_cache", max_bytes: int = 500 * 1024 * 1024, max_age_seconds: float = 30 * 24 * 3600):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory the rendered PDFs are stored in. Created if it does not exist.
+            max_bytes (int): Total size the cache may grow to before the least recently used entries are evicted.
+            max_age_seconds (float): Entries not used for this long are treated as missing and removed. None disables age eviction.
+        """
+        super().__init__(cache_dir, max_bytes, max_age_seconds)
+
+    @staticmethod
+    def make_key(content_hash: str, template_version: int, seed: Union[int, list]) -> str:
+        """
+        Create the cache key for a render.
+
+        Args:
+            content_hash (str): Hash of the content rendered, a section's or the whole document's
+            template_version (int): The layout TEMPLATE_VERSION
+            seed (Union[int, list]): The section's render seed, or for a whole document the list of
+                its sections' seeds in document order
+
+        Returns:
+            str: Hex digest identifying the render
+        """
+        payload = json.dumps({"content": content_hash, "template_version": template_version, "seed": seed}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _write(self, path: str, content: bytes):
+        with open(path, "wb") as f:
+            f.write(content)
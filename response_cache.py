@@ -0,0 +1,185 @@
+"""
+On-disk, content-addressed cache for the responses returned by the model.
+Entries are keyed by a hash of everything that determines the response (model, prompt template,
+topic, difficulty and output schema), so re-rendering a document or re-running a batch that
+stopped halfway does not need to call the model again.
+"""
+import hashlib
+import json
+import os
+import time
+import threading
+
+
+class ResponseCache:
+    extension = ".json"  # Suffix of the entry files, so eviction leaves unrelated files alone
+    scan_interval = 100  # Writes between full scans of the cache directory
+    low_water = 0.9  # Size eviction removes entries until the cache is this fraction of max_bytes
+
+    # Per process: (cache directory, extension) -> [approximate total bytes, writes since the last scan]. Shared by
+    # every instance, as e.g. render workers open a new cache for each job.
+    _usage = {}
+    _usage_lock = threading.Lock()
+
+    def __init__(self, cache_dir: str = ".llm_cache", max_bytes: int = 200 * 1024 * 1024, max_age_seconds: float = 30 * 24 * 3600):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory the cache entries are stored in. Created if it does not exist.
+            max_bytes (int): Total size the cache may grow to before the least recently used entries are evicted.
+            max_age_seconds (float): Entries not used for this long are treated as missing and removed. None disables age eviction.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model: str, template: str, topic: str, difficulty: str, schema: dict) -> str:
+        """
+        Create the cache key for a request.
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        payload = json.dumps(
+            {"model": model, "template": template, "topic": topic, "difficulty": difficulty, "schema": schema},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}{self.extension}")
+
+    def get(self, key: str):
+        """
+        Look up a cached response.
+
+        Returns:
+            str: The cached response content, or None if there is no valid entry
+        """
+        path = self._path(key)
+        try:
+            content = self._read(path)
+            # Aged by mtime, like evict: the time since the entry was written or last used
+            if self.max_age_seconds is not None and time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                self._remove(path)
+                raise FileNotFoundError(path)
+            # Touch the file so size eviction removes the least recently used entries first
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def set(self, key: str, content: str):
+        """
+        Store a response and evict old entries if the cache has grown past its limits.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._write(tmp_path, content)
+        self._replace(tmp_path, path)
+
+    def _read(self, path: str):
+        """
+        Read an entry's content. Subclasses storing another format override this and _write.
+
+        Raises:
+            OSError, ValueError: If there is no valid entry at path
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        if not isinstance(entry, dict) or "content" not in entry:
+            raise ValueError(f"Malformed cache entry: {path}")
+        return entry["content"]
+
+    def _write(self, path: str, content):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "content": content}, f)
+
+    def _replace(self, tmp_path: str, path: str):
+        """
+        Move a written entry into place and evict if the cache may have grown past its limits.
+        Rather than scanning the directory on every write, the total size is tracked approximately and
+        a full scan only runs the first time, every scan_interval writes (picking up other processes'
+        writes and expired entries) or once the estimate passes max_bytes.
+        """
+        try:
+            replaced_bytes = os.path.getsize(path)
+        except OSError:
+            replaced_bytes = 0
+        added_bytes = os.path.getsize(tmp_path) - replaced_bytes
+        os.replace(tmp_path, path)  # Atomic, so concurrent readers never see a partial entry
+        with self._usage_lock:
+            usage = self._usage.get(self._usage_key())
+            if usage is None:
+                scan = True
+            else:
+                usage[0] += added_bytes
+                usage[1] += 1
+                scan = usage[1] >= self.scan_interval or (self.max_bytes is not None and usage[0] > self.max_bytes)
+        if scan:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove expired entries, then, if the cache is over max_bytes, the least recently used ones until
+        it is down to low_water of max_bytes, so the next few writes do not need another scan.
+        """
+        entries = []
+        total_bytes = 0
+        now = time.time()
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.extension):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                # mtime is refreshed on every hit, so it only exceeds the age limit if the entry is stale as well
+                if self.max_age_seconds is not None and now - stat.st_mtime > self.max_age_seconds:
+                    self._remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_bytes += stat.st_size
+
+        if self.max_bytes is not None and total_bytes > self.max_bytes:
+            for _, size, path in sorted(entries):
+                self._remove(path)
+                total_bytes -= size
+                if total_bytes <= self.max_bytes * self.low_water:
+                    break
+        with self._usage_lock:
+            self._usage[self._usage_key()] = [total_bytes, 0]
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(self.extension):
+                    self._remove(os.path.join(root, name))
+        with self._usage_lock:
+            self._usage[self._usage_key()] = [0, 0]
+
+    def _usage_key(self) -> tuple:
+        return os.path.abspath(self.cache_dir), self.extension
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
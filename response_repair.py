@@ -0,0 +1,123 @@
+"""
+Repair of model responses that fail schema validation.
+ResourceCreator tries, in order: a cheap local repair of the JSON text, a targeted re-ask that only
+sends back the failing fields, and finally a capped full regeneration. RepairStats counts which
+path produced each valid response, so the average number of model calls per task can be tracked.
+"""
+import json
+import re
+import threading
+from pydantic import BaseModel, ValidationError
+
+THINK_PATTERN = re.compile(r"<think>.*?</think>", re.DOTALL)
+FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+PYTHON_LITERAL_PATTERN = re.compile(r'("(?:[^"\\]|\\.)*")|\b(True|False|None)\b')
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def repair_json_text(text: str) -> str:
+    """
+    Fix the common ways the model breaks JSON: reasoning preambles, markdown fences, text around
+    the object, trailing commas and Python style True/False/None literals.
+    """
+    text = THINK_PATTERN.sub("", text).strip()
+    text = FENCE_PATTERN.sub("", text).strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        text = text[start:end + 1]
+    text = TRAILING_COMMA_PATTERN.sub(r"\1", text)
+    # Replace bare literals only, leaving the contents of strings untouched
+    return PYTHON_LITERAL_PATTERN.sub(lambda m: m.group(1) or PYTHON_LITERALS[m.group(2)], text)
+
+
+def coerce_booleans(data, schema: dict):
+    """
+    Convert "True"/"False" strings to booleans wherever the schema expects a boolean.
+    """
+    def coerce(value, field_schema):
+        field_type = field_schema.get("type")
+        if field_type == "boolean" and isinstance(value, str) and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+        if field_type == "array" and isinstance(value, list):
+            return [coerce(item, field_schema.get("items", {})) for item in value]
+        return value
+
+    if not isinstance(data, dict):
+        return data
+    properties = schema.get("properties", {})
+    return {key: coerce(value, properties.get(key, {})) for key, value in data.items()}
+
+
+def local_repair(content: str, response_model: type[BaseModel]):
+    """
+    Try to make the response valid without asking the model again.
+
+    Returns:
+        tuple: (validated model or None, best parsed dict or None, ValidationError or None)
+    """
+    schema = response_model.model_json_schema()
+    try:
+        data = json.loads(repair_json_text(content))
+    except ValueError:
+        return None, None, None
+    data = coerce_booleans(data, schema)
+    try:
+        return response_model.model_validate(data), data, None
+    except ValidationError as e:
+        return None, data if isinstance(data, dict) else None, e
+
+
+def failing_fields(error: ValidationError) -> list:
+    """
+    Top-level fields named in a validation error, in order of first appearance.
+    """
+    fields = []
+    for detail in error.errors():
+        if detail["loc"] and isinstance(detail["loc"][0], str) and detail["loc"][0] not in fields:
+            fields.append(detail["loc"][0])
+    return fields
+
+
+def partial_schema(schema: dict, fields: list) -> dict:
+    """
+    Restrict a JSON schema to the given top-level fields, for a targeted re-ask.
+    """
+    partial = dict(schema)
+    partial["properties"] = {name: schema["properties"][name] for name in fields if name in schema.get("properties", {})}
+    partial["required"] = [name for name in schema.get("required", []) if name in fields]
+    return partial
+
+
+def reask_prompt(error: ValidationError, fields: list) -> str:
+    problems = "\n".join(f"- {'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors())
+    return (f"Some fields of your JSON response were invalid:\n{problems}\n"
+            f"Return a JSON object containing only the corrected fields {', '.join(fields)}.")
+
+
+class RepairStats:
+    """Thread-safe counters of how valid responses were obtained."""
+
+    PATHS = ("valid", "local_repair", "targeted_reask", "regenerated", "failed", "aborted")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {path: 0 for path in self.PATHS}
+        self.model_calls = 0
+
+    def record(self, path: str):
+        with self._lock:
+            self.counts[path] += 1
+
+    def record_call(self):
+        with self._lock:
+            self.model_calls += 1
+
+    def calls_per_valid_task(self) -> float:
+        with self._lock:
+            valid = sum(self.counts[path] for path in ("valid", "local_repair", "targeted_reask", "regenerated"))
+            return self.model_calls / valid if valid else 0.0
+
+    def summary(self) -> str:
+        counts = ", ".join(f"{path}={count}" for path, count in self.counts.items())
+        return f"{counts}; {self.calls_per_valid_task():.2f} model calls per valid task"
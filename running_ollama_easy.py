@@ -1,6 +1,12 @@
+import time
 from ollama import chat
 from ollama import ChatResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from response_cache import ResponseCache
+from streaming_json import IncrementalJSONValidator, StreamProgress, StreamAbortedError
+from ollama_pool import OllamaEndpointPool
+from response_repair import RepairStats, local_repair, failing_fields, partial_schema, reask_prompt
+from tracing import TRACER, annotate
 
 
 class ResponsePrep(BaseModel):
@@ -41,21 +47,39 @@ class ResponseMidTaskOrdering(BaseModel):
 class ResponseDiscussion(BaseModel):
   explanation : str
   answer: dict
+
+class PrepTaskContent(BaseModel):
+  labels: list[str]
+  correct_pairs: dict[str, str]
+
+class MidTaskContent(BaseModel):
+  topic: str
+  extract : str
+  questions: list[str]
+  answers: list[bool]
+
+class DiscussionContent(BaseModel):
+  question: str
+
+class ResponseWorksheet(BaseModel):
+  """Response model for generating all three sections of a worksheet in one call.
+  The sections are loosely typed so one malformed section does not invalidate the others;
+  each is checked against its own content model afterwards.
+
+  Args:
+      BaseModel (pydantic.BaseModel): Base model for data validation.
+  """
+  explanation : str
+  preparation_task: dict
+  middle_task: dict
+  discussion: dict
  
  
-class ResourceCreator():
-  def __init__(self, topic="A restaurant menu", model = "deepseek-r1:latest"):
-    self.topic = topic
-    self.difficulty = "A1"
-    self.model = model
-
-  def create_preparation_task(self) -> ResponsePrep:
-    # This creates a ResponsePrep object which can be parsed to populate a PreparationTask
-    response = chat(model=self.model, messages=[
-      {
-        'role': 'user',
-        'content': f"""you are a helpful assistant that can help with creating preparation tasks for language learning materials.
-        The preparation task should be a one-to-one matching task, matching words from two separate categories. The topic to create this preparation task on is: {self.topic}
+# Prompt templates. {topic} is filled in by ResourceCreator; literal braces are doubled.
+# Everything before the final topic line is identical across topics, so consecutive requests share a
+# long prompt prefix that the backend can reuse from its cache while the model stays loaded.
+PREPARATION_TASK_PROMPT = """you are a helpful assistant that can help with creating preparation tasks for language learning materials.
+        The preparation task should be a one-to-one matching task, matching words from two separate categories.
         Provide as output a dictionary containing keys "labels", "correct_pairs". Return as JSON.
         
         EXAMPLE OUTPUT:
@@ -64,22 +88,13 @@ class ResourceCreator():
           "correct_pairs": {{"Beijing": "China", "Buenos Aires": "Argentina", "Los Angeles": "The United States of America", "Amsterdam": "The Netherlands", "Mexico City": "Mexico", "Seoul": "The Republic of Korea", "Christchurch": "New Zealand", "Moscow": "Russia"}}
           }}
         
-        """,
-      },
-        ],
-        format = ResponsePrep.model_json_schema()
-    )
-    response_out = ResponsePrep.model_validate_json(response.message.content)
-    return response_out.answer if response_out else None
+        The topic to create this preparation task on is: {topic}
+        """
 
-  def create_middle_task(self) -> dict:
-    response = chat(model=self.model, messages=[
-      {
-        'role': 'user',
-        'content': f"""You are a helpful assistant that can help with creating extracts for English comprehension tasks, including relevant True/False questions.
+MIDDLE_TASK_PROMPT = """You are a helpful assistant that can help with creating extracts for English comprehension tasks, including relevant True/False questions.
         The extract should be approximately 100-150 words in length.
         The extract should be themed corresponding to the topic described. Questions should be based on the extract.
-        The topic to create this extract on is: {self.topic}. Return as JSON.
+        Return as JSON.
         
         EXAMPLE OUTPUT:
           {{"topic": "An email from a friend",
@@ -99,31 +114,14 @@ class ResourceCreator():
           ],
           "answers": [True, True, True, False, False, False],
           }}
-        """,
-      },
-        ],
-        format = ResponseMidTask2.model_json_schema()
-    )
-    response_out = ResponseMidTask2.model_validate_json(response.message.content)
-    
-    # Convert ResponseMidTask2 to dictionary format compatible with existing content_dict structure
-    if response_out:
-      return {
-        "topic": response_out.topic,
-        "extract": response_out.extract,
-        "questions": response_out.questions,
-        "answers": response_out.answers
-      }
-    return None
-  
-  def create_middle_task_test2(self) -> ResponseMidTask2:
-    response = chat(model=self.model, messages=[
-      {
-        'role': 'user',
-        'content': f"""You are a helpful assistant that can help with creating extracts for English comprehension tasks, including relevant True/False questions.
+        
+        The topic to create this extract on is: {topic}
+        """
+
+MIDDLE_TASK_TEST2_PROMPT = """You are a helpful assistant that can help with creating extracts for English comprehension tasks, including relevant True/False questions.
         The extract should be approximately 100-150 words in length.
         The extract should be themed corresponding to the topic described. Questions should be based on the extract.
-        The topic to create this extract on is: {self.topic}. Return as JSON.
+        Return as JSON.
         
         EXAMPLE OUTPUT:
           {{"topic": "An email from a friend",
@@ -143,22 +141,14 @@ class ResourceCreator():
           ],
           "answers": [True, True, True, False, False, False],
           }}
-        """,
-      },
-        ],
-        format = ResponseMidTask2.model_json_schema()
-    )
-    response_out = ResponseMidTask2.model_validate_json(response.message.content)
-    return response_out.answer if response_out else None
+        
+        The topic to create this extract on is: {topic}
+        """
 
-  def create_discussion(self) -> ResponseDiscussion:
-    response = chat(model=self.model, messages=[
-      {
-        'role': 'user',
-        'content': f"""You are a helpful assistant that can help with creating discussion prompts for English comprehension tasks.
+DISCUSSION_PROMPT = """You are a helpful assistant that can help with creating discussion prompts for English comprehension tasks.
         The discussion prompt should consist of a single question.
         The discussion prompt should be related to the topic specified.
-        The topic to create this discussion prompt on is {self.topic}. Return as JSON.
+        Return as JSON.
         
         EXAMPLE OUTPUT:
         {{
@@ -166,16 +156,294 @@ class ResourceCreator():
           "question": "How often do you travel by plane? Which countries would you like to visit?"
           }}
         
-        """,
+        The topic to create this discussion prompt on is {topic}
+        """
+
+WORKSHEET_PROMPT = """You are a helpful assistant that can help with creating worksheets for English language learning materials.
+        Create all three sections of a worksheet on the topic given at the end. Return as JSON with the keys "explanation", "preparation_task", "middle_task" and "discussion".
+        - "preparation_task": a one-to-one matching task, matching words from two separate categories, with keys "labels" and "correct_pairs".
+        - "middle_task": an extract of approximately 100-150 words themed on the topic, with True/False questions based on the extract. Keys "topic", "extract", "questions" and "answers".
+        - "discussion": a discussion prompt consisting of a single question related to the topic, with the key "question".
+        
+        EXAMPLE OUTPUT:
+        {{
+          "explanation": "...",
+          "preparation_task": {{"labels": ["Cities", "Countries"], "correct_pairs": {{"Beijing": "China", "Buenos Aires": "Argentina", "Amsterdam": "The Netherlands", "Moscow": "Russia"}}}},
+          "middle_task": {{"topic": "An email from a friend", "extract": "Hi Samia, ...", "questions": ["Samia and Gregor are going to meet on Saturday", "The house is easy to find"], "answers": [True, False]}},
+          "discussion": {{"question": "How often do you travel by plane? Which countries would you like to visit?"}}
+          }}
+        
+        The topic to create this worksheet on is: {topic}
+        """
+
+
+class ResourceCreator():
+  def __init__(self, topic="A restaurant menu", model = "deepseek-r1:latest", difficulty = "A1", cache : ResponseCache = None, use_cache = True, refresh = False, limiter = None, skill = None, retriever = None, stream = False, on_progress = None, max_regenerations = 2, repair_stats : RepairStats = None, endpoints = None, keep_alive = "30m", call_metrics : list = None):
+    """
+    Args:
+        topic (str): The topic to create content on
+        model (str): The Ollama model to use
+        difficulty (str): The difficulty level, part of the cache key
+        cache (ResponseCache, optional): On-disk cache of validated responses. No caching if None.
+        use_cache (bool): Set to False to bypass the cache entirely (no reads or writes)
+        refresh (bool): Set to True to ignore cached entries but store the new responses
+        limiter (threading.Semaphore, optional): Shared semaphore capping how many model requests are in flight
+        skill (str, optional): The language skill, used to pick few-shot examples
+        retriever (ExampleRetriever, optional): Index of existing resources to draw few-shot examples from
+        stream (bool): Stream responses and validate them as they arrive, aborting malformed ones early
+        on_progress (callable, optional): Called with a progress dict (tokens, tokens_per_second, fields_completed, ...)
+            for every streamed token. Called from the thread making the request.
+        max_regenerations (int): Full regenerations allowed after an invalid response that could not be repaired
+        repair_stats (RepairStats, optional): Counters of how valid responses were obtained. Share one instance
+            between creators to aggregate them over a batch.
+        endpoints (Union[list, OllamaEndpointPool], optional): Ollama hosts (or a pool shared between creators) to
+            balance requests over. Uses the default local Ollama if None.
+        keep_alive (str): How long the model stays loaded after a request, so the shared prompt prefix
+            stays in the backend's cache between topics
+        call_metrics (list, optional): List to append per-call timings to (prompt evaluation vs generation).
+            Share one list between creators to aggregate them over a batch.
+    """
+    self.topic = topic
+    self.difficulty = difficulty
+    self.model = model
+    self.cache = cache
+    self.use_cache = use_cache
+    self.refresh = refresh
+    self.limiter = limiter
+    self.skill = skill
+    self.retriever = retriever
+    self.stream = stream
+    self.on_progress = on_progress
+    self.max_regenerations = max_regenerations
+    self.repair_stats = repair_stats if repair_stats is not None else RepairStats()
+    self.endpoints = OllamaEndpointPool(endpoints) if isinstance(endpoints, (list, tuple)) else endpoints
+    self.keep_alive = keep_alive
+    self.call_metrics = call_metrics if call_metrics is not None else []
+
+  def _examples(self, example_section : str) -> str:
+    """Retrieve the closest existing tasks' example_section as a few-shot block, if a retriever is configured."""
+    if self.retriever is None or example_section is None:
+      return ""
+    examples = self.retriever.format_examples(self.topic, example_section, skill=self.skill, level=self.difficulty)
+    return f"\n        SIMILAR EXISTING TASKS (for content and level, not format):\n{examples}\n" if examples else ""
+
+  def _request(self, template : str, response_model : type[BaseModel], example_section : str = None) -> BaseModel:
+    """Send the prompt built from the template to the model and validate the response against response_model.
+    Invalid responses go through local repair, then a targeted re-ask of the failing fields, then up to
+    max_regenerations full regenerations. Validated responses are stored in (and served from) the cache
+    when one is configured. Traced as a "generate" span, with one "model_call" span per call.
+    """
+    with TRACER.span("generate", response_model=response_model.__name__, model=self.model, topic=self.topic, difficulty=self.difficulty):
+      return self._request_untraced(template, response_model, example_section)
+
+  def _request_untraced(self, template : str, response_model : type[BaseModel], example_section : str = None) -> BaseModel:
+    schema = response_model.model_json_schema()
+    examples = self._examples(example_section)
+    key = None
+    if self.cache is not None and self.use_cache:
+      key = self.cache.make_key(self.model, template + examples, self.topic, self.difficulty, schema)
+      if not self.refresh:
+        cached = self.cache.get(key)
+        if cached is not None:
+          annotate(cache_hit=True)
+          return response_model.model_validate_json(cached)
+
+    messages = [
+      {
+        'role': 'user',
+        'content': template.format(topic=self.topic) + examples,
       },
-        ],
-        format = ResponseDiscussion.model_json_schema()
-    )
-    response_out = ResponseDiscussion.model_validate_json(response.message.content)
+        ]
+    last_error = None
+    for attempt in range(self.max_regenerations + 1):
+      try:
+        response = self._chat(messages, schema, response_model.__name__)
+      except StreamAbortedError as e:
+        self.repair_stats.record("aborted")
+        last_error = e
+        continue
+      response_out, path, last_error = self._validate(messages, response.message.content, response_model)
+      if response_out is not None:
+        self.repair_stats.record("regenerated" if attempt else path)
+        annotate(path="regenerated" if attempt else path, attempts=attempt + 1, retries=attempt)
+        if key is not None:
+          self.cache.set(key, response_out.model_dump_json())
+        return response_out
+    self.repair_stats.record("failed")
+    annotate(path="failed", attempts=self.max_regenerations + 1, retries=self.max_regenerations)
+    raise last_error
+
+  def _validate(self, messages : list, content : str, response_model : type[BaseModel]):
+    """Validate a response, repairing it locally or re-asking for just the failing fields if needed.
+    Returns (validated model or None, path that succeeded, last error).
+    """
+    try:
+      return response_model.model_validate_json(content), "valid", None
+    except ValidationError as e:
+      error = e
+    response_out, data, repair_error = local_repair(content, response_model)
+    if response_out is not None:
+      return response_out, "local_repair", None
+    if data is None or repair_error is None:
+      return None, None, error  # Not even parseable JSON, so only a regeneration can help
+
+    fields = failing_fields(repair_error)
+    reask_messages = messages + [
+      {'role': 'assistant', 'content': content},
+      {'role': 'user', 'content': reask_prompt(repair_error, fields)},
+    ]
+    try:
+      response = self._chat(reask_messages, partial_schema(response_model.model_json_schema(), fields), response_model.__name__)
+    except StreamAbortedError as e:
+      return None, None, e
+    _, fixed, _ = local_repair(response.message.content, response_model)
+    if fixed is None:
+      return None, None, repair_error
+    try:
+      return response_model.model_validate({**data, **fixed}), "targeted_reask", None
+    except ValidationError as e:
+      return None, None, e
+
+  def _chat(self, messages : list, schema : dict, name : str = None) -> ChatResponse:
+    self.repair_stats.record_call()
+    with TRACER.span("model_call", response_model=name, model=self.model, topic=self.topic, streamed=self.stream):
+      if self.limiter is not None:
+        wait_start = time.perf_counter()
+        with self.limiter:
+          annotate(limiter_wait_seconds=time.perf_counter() - wait_start)
+          return self._chat_unlimited(messages, schema, name)
+      return self._chat_unlimited(messages, schema, name)
+
+  def _chat_unlimited(self, messages : list, schema : dict, name : str = None) -> ChatResponse:
+    if self.stream:
+      return self._chat_stream(messages, schema, name)
+    start = time.perf_counter()
+    response = self._chat_fn(model=self.model, messages=messages, format = schema, keep_alive = self.keep_alive)
+    self._record_call_metrics(name, response, time.perf_counter() - start)
+    return response
+
+  def _record_call_metrics(self, name : str, response : ChatResponse, elapsed : float, time_to_first_token : float = None):
+    """Record how the time of one call split between loading, prompt evaluation and generation."""
+    seconds = lambda nanoseconds: (nanoseconds or 0) / 1e9
+    load_seconds = seconds(getattr(response, "load_duration", None))
+    prompt_eval_seconds = seconds(getattr(response, "prompt_eval_duration", None))
+    if time_to_first_token is None:
+      time_to_first_token = load_seconds + prompt_eval_seconds
+    metrics = {
+      "name": name,
+      "model": self.model,
+      "topic": self.topic,
+      "prompt_tokens": getattr(response, "prompt_eval_count", None) or 0,
+      "prompt_eval_seconds": prompt_eval_seconds,
+      "load_seconds": load_seconds,
+      "eval_tokens": getattr(response, "eval_count", None) or 0,
+      "eval_seconds": seconds(getattr(response, "eval_duration", None)),
+      "time_to_first_token": time_to_first_token,
+      "total_seconds": elapsed,
+    }
+    self.call_metrics.append(metrics)
+    annotate(**{field: metrics[field] for field in ("prompt_tokens", "prompt_eval_seconds", "load_seconds",
+                                                     "eval_tokens", "eval_seconds", "time_to_first_token")})
+
+  @property
+  def _chat_fn(self):
+    return self.endpoints.chat if self.endpoints is not None else chat
+
+  def _chat_stream(self, messages : list, schema : dict, name : str = None) -> ChatResponse:
+    """Stream the response, validating it against the schema as it arrives.
+    Raises StreamAbortedError as soon as the output can no longer be valid, closing the request,
+    or if the stream ended without a single chunk.
+    """
+    validator = IncrementalJSONValidator(schema)
+    progress = StreamProgress(name, validator)
+    parts = []
+    last_chunk = None
+    start = time.perf_counter()
+    time_to_first_token = None
+    response_stream = self._chat_fn(model=self.model, messages=messages, format = schema, stream = True, keep_alive = self.keep_alive)
+    try:
+      for chunk in response_stream:
+        last_chunk = chunk
+        if time_to_first_token is None and chunk.message.content:
+          time_to_first_token = time.perf_counter() - start
+        parts.append(chunk.message.content)
+        validator.feed(chunk.message.content)
+        if self.on_progress is not None:
+          self.on_progress(progress.update())
+      if last_chunk is None:
+        raise StreamAbortedError("The model returned an empty stream")
+      validator.close()
+    finally:
+      response_stream.close()  # Stops the generation if we aborted early
+    # The final chunk carries the timing and token counts; give it the whole message
+    last_chunk.message.content = "".join(parts)
+    self._record_call_metrics(name, last_chunk, time.perf_counter() - start, time_to_first_token)
+    return last_chunk
+
+  def create_preparation_task(self) -> ResponsePrep:
+    # This creates a ResponsePrep object which can be parsed to populate a PreparationTask
+    response_out = self._request(PREPARATION_TASK_PROMPT, ResponsePrep, example_section="Preparation Task")
+    return response_out.answer if response_out else None
+
+  def create_middle_task(self) -> dict:
+    response_out = self._request(MIDDLE_TASK_PROMPT, ResponseMidTask2, example_section="Reading Text")
+    
+    # Convert ResponseMidTask2 to dictionary format compatible with existing content_dict structure
+    if response_out:
+      return {
+        "topic": response_out.topic,
+        "extract": response_out.extract,
+        "questions": response_out.questions,
+        "answers": response_out.answers
+      }
+    return None
+  
+  def create_middle_task_test2(self) -> ResponseMidTask2:
+    response_out = self._request(MIDDLE_TASK_TEST2_PROMPT, ResponseMidTask2)
+    return response_out.answer if response_out else None
+
+  def create_discussion(self) -> ResponseDiscussion:
+    response_out = self._request(DISCUSSION_PROMPT, ResponseDiscussion)
     return response_out.answer if response_out else None
+
+  def create_worksheet(self) -> dict:
+    """Create the preparation task, middle task and discussion content with a single model call.
+    Sections missing from or invalid in the combined response are generated again with their own call.
+    Returns a dictionary with keys "preparation_task", "middle_task" and "discussion", holding the same
+    content as create_preparation_task, create_middle_task and create_discussion.
+    """
+    sections = {
+      "preparation_task": (PrepTaskContent, self.create_preparation_task),
+      "middle_task": (MidTaskContent, self.create_middle_task),
+      "discussion": (DiscussionContent, self.create_discussion),
+    }
+    try:
+      combined = self._request(WORKSHEET_PROMPT, ResponseWorksheet).model_dump()
+    except (ValidationError, StreamAbortedError) as e:
+      print(f"Combined worksheet generation failed, generating each section separately: {e}")
+      combined = {}
+
+    worksheet = {}
+    for name, (content_model, fallback) in sections.items():
+      try:
+        worksheet[name] = content_model.model_validate(combined.get(name)).model_dump()
+      except ValidationError:
+        print(f"Section {name} of the combined response is invalid, generating it separately...")
+        worksheet[name] = fallback()
+    return worksheet
 # This is where the topic name would go. "The topic to create ... "
 
 
+def summarize_call_metrics(call_metrics : list) -> str:
+  """Average prompt evaluation time, generation time and time to first token over recorded calls."""
+  if not call_metrics:
+    return "no model calls recorded"
+  average = lambda field: sum(metric[field] for metric in call_metrics) / len(call_metrics)
+  return (f"{len(call_metrics)} call(s): prompt eval {average('prompt_eval_seconds'):.2f}s "
+          f"({average('prompt_tokens'):.0f} tokens), generation {average('eval_seconds'):.2f}s "
+          f"({average('eval_tokens'):.0f} tokens), time to first token {average('time_to_first_token'):.2f}s")
+
+
 if __name__ == "__main__":
   # res_creator = ResourceCreator(topic="A restaurant menu", model = "deepseek-r1:latest")
   # print(res_creator.create_preparation_task().answer)
@@ -0,0 +1,249 @@
+"""
+Incremental validation of a JSON document as it is streamed from the model.
+The validator is fed the response chunk by chunk and raises StreamAbortedError as soon as the text
+can no longer become a valid instance of the schema, so a malformed generation can be abandoned
+after a few tokens instead of after the whole completion.
+"""
+import time
+
+WHITESPACE = " \t\r\n"
+LITERALS = ("true", "false", "null")
+NUMBER_CHARS = set("0123456789+-.eE")
+
+# First characters a JSON value may start with for each schema type.
+# Strings are allowed for booleans and numbers, as pydantic accepts "true" / "1" for them.
+TYPE_START_CHARS = {
+    "string": set('"'),
+    "array": set("["),
+    "object": set("{"),
+    "boolean": set('tf"'),
+    "integer": set('-0123456789"'),
+    "number": set('-0123456789"'),
+}
+
+
+class StreamAbortedError(ValueError):
+    """Raised when a streamed response can no longer be valid for its schema."""
+
+
+class IncrementalJSONValidator:
+    def __init__(self, schema: dict):
+        """
+        Args:
+            schema (dict): JSON schema of the expected response, e.g. ResponsePrep.model_json_schema()
+        """
+        self.schema = schema
+        self.properties = schema.get("properties", {})
+        self.stack = []  # One entry per open container: {"type": "object"/"array", "state": ..., "key": ...}
+        self.started = False
+        self.finished = False
+        self.in_string = False
+        self.escape = False
+        self.string_is_key = False
+        self.current_key = []
+        self.literal = None  # (text so far, candidates) while reading true/false/null
+        self.in_number = False
+        self.in_think = False
+        self.preamble = ""
+        self.fields_completed = []
+        self.chars = 0
+
+    def _fail(self, reason: str):
+        raise StreamAbortedError(f"Invalid response after {self.chars} characters: {reason}")
+
+    def _expected_type(self):
+        """Schema type expected for the value about to start, or None if unconstrained."""
+        if len(self.stack) == 1 and self.stack[0]["type"] == "object":
+            return self.properties.get(self.stack[0]["key"], {}).get("type")
+        if len(self.stack) == 2 and self.stack[1]["type"] == "array" and self.stack[0]["type"] == "object":
+            return self.properties.get(self.stack[0]["key"], {}).get("items", {}).get("type")
+        return None
+
+    def _start_value(self, char: str):
+        expected = self._expected_type()
+        if expected in TYPE_START_CHARS and char not in TYPE_START_CHARS[expected]:
+            key = self.stack[0]["key"]
+            self._fail(f'field "{key}" should be of type {expected}')
+        if char == "{":
+            self.stack.append({"type": "object", "state": "key_or_end", "key": None})
+        elif char == "[":
+            self.stack.append({"type": "array", "state": "value_or_end"})
+        elif char == '"':
+            self.in_string = True
+            self.string_is_key = False
+        elif char in "tfn":
+            self.literal = (char, [literal for literal in LITERALS if literal.startswith(char)])
+        elif char == "-" or char.isdigit():
+            self.in_number = True
+        else:
+            self._fail(f"unexpected character {char!r}")
+
+    def _end_value(self):
+        """Called when a value has been completed in the current container."""
+        if not self.stack:
+            self.finished = True
+            return
+        container = self.stack[-1]
+        if len(self.stack) == 1 and container["type"] == "object":
+            self.fields_completed.append(container["key"])
+        container["state"] = "comma_or_end"
+
+    def _close_container(self):
+        container = self.stack.pop()
+        if not self.stack and container["type"] == "object":
+            missing = [name for name in self.schema.get("required", []) if name not in self.fields_completed]
+            if missing:
+                self._fail(f"missing required field(s) {missing}")
+        self._end_value()
+
+    def feed(self, text: str):
+        """
+        Feed the next chunk of the response.
+
+        Raises:
+            StreamAbortedError: If the response can no longer be valid
+        """
+        for char in text:
+            self.chars += 1
+            self._feed_char(char)
+
+    def _feed_char(self, char: str):
+        if self.in_number:
+            if char in NUMBER_CHARS:
+                return
+            self.in_number = False
+            self._end_value()
+            # Fall through: the character after a number is structural
+
+        if self.literal is not None:
+            so_far, candidates = self.literal
+            so_far += char
+            candidates = [literal for literal in candidates if literal.startswith(so_far)]
+            if not candidates:
+                self._fail(f"invalid literal {so_far!r}")
+            if so_far in candidates:
+                self.literal = None
+                self._end_value()
+            else:
+                self.literal = (so_far, candidates)
+            return
+
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif char == "\\":
+                self.escape = True
+            elif char == '"':
+                self.in_string = False
+                if self.string_is_key:
+                    key = "".join(self.current_key)
+                    self.current_key = []
+                    self.stack[-1]["key"] = key
+                    self.stack[-1]["state"] = "colon"
+                else:
+                    self._end_value()
+            elif self.string_is_key:
+                self.current_key.append(char)
+            return
+
+        if not self.started:
+            # Allow whitespace and a leading <think>...</think> block from reasoning models
+            if self.in_think:
+                self.preamble += char
+                if self.preamble.endswith("</think>"):
+                    self.in_think = False
+                    self.preamble = ""
+                return
+            if char in WHITESPACE:
+                return
+            if char == "<" or self.preamble:
+                self.preamble += char
+                if "<think>".startswith(self.preamble):
+                    if self.preamble == "<think>":
+                        self.in_think = True
+                        self.preamble = ""
+                    return
+                self._fail("text before the JSON document")
+            if char != "{":
+                self._fail("response must be a JSON object")
+            self.started = True
+            self.stack.append({"type": "object", "state": "key_or_end", "key": None})
+            return
+
+        if char in WHITESPACE:
+            return
+        if self.finished:
+            self._fail("text after the JSON document")
+
+        container = self.stack[-1]
+        state = container["state"]
+        if container["type"] == "object":
+            if state in ("key_or_end", "key"):
+                if char == '"':
+                    self.in_string = True
+                    self.string_is_key = True
+                elif char == "}" and state == "key_or_end":
+                    self._close_container()
+                else:
+                    self._fail(f"expected a key, got {char!r}")
+            elif state == "colon":
+                if char != ":":
+                    self._fail(f"expected ':', got {char!r}")
+                container["state"] = "value"
+            elif state == "value":
+                self._start_value(char)
+            elif state == "comma_or_end":
+                if char == ",":
+                    container["state"] = "key"
+                elif char == "}":
+                    self._close_container()
+                else:
+                    self._fail(f"expected ',' or '}}', got {char!r}")
+        else:
+            if state in ("value_or_end", "value"):
+                if char == "]" and state == "value_or_end":
+                    self._close_container()
+                else:
+                    self._start_value(char)
+            elif state == "comma_or_end":
+                if char == ",":
+                    container["state"] = "value"
+                elif char == "]":
+                    self._close_container()
+                else:
+                    self._fail(f"expected ',' or ']', got {char!r}")
+
+    def close(self):
+        """
+        Called once the stream has ended.
+
+        Raises:
+            StreamAbortedError: If the document is incomplete
+        """
+        if self.in_number and len(self.stack) == 0:
+            self.in_number = False
+            self._end_value()
+        if not self.finished:
+            self._fail("response ended before the JSON document was complete")
+
+
+class StreamProgress:
+    """Tracks tokens and completed fields of one streamed response, for progress callbacks."""
+
+    def __init__(self, name: str, validator: IncrementalJSONValidator):
+        self.name = name
+        self.validator = validator
+        self.tokens = 0
+        self.start = time.perf_counter()
+
+    def update(self) -> dict:
+        self.tokens += 1
+        elapsed = time.perf_counter() - self.start
+        return {
+            "name": self.name,
+            "tokens": self.tokens,
+            "elapsed": elapsed,
+            "tokens_per_second": self.tokens / elapsed if elapsed > 0 else 0.0,
+            "fields_completed": list(self.validator.fields_completed),
+            "fields_total": len(self.validator.properties),
+        }
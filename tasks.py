@@ -1,20 +1,194 @@
 from typing import Union
-from PyPDF2 import PdfReader, PdfWriter
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.platypus import Paragraph
 from reportlab.platypus import PageBreak
+from reportlab.platypus import Frame, Spacer, Table, TableStyle
+from xml.sax.saxutils import escape
 from reportlab.lib.colors import black
 from io import BytesIO
+import hashlib
+import json
+import math
 import os
 import random
+from tracing import TRACER
 from running_ollama_easy import ResourceCreator, ResponsePrep, ResponseMidTask, ResponseMidTask2, ResponseMidTaskQuestionsMCQ, ResponseDiscussion, BaseModel
 
+# Bump whenever the layout below changes, so cached renders of older layouts are not reused
+TEMPLATE_VERSION = 2
+
+# Paragraph styles are immutable once built, so they are created once and shared by every render
+INSTRUCTION_STYLE = ParagraphStyle(
+    'InstructionStyle',
+    fontName='Helvetica',
+    fontSize=12,
+    textColor=black,
+    leftIndent=0,
+    rightIndent=30 * mm,
+    spaceAfter=6,
+    spaceBefore=3,
+    alignment=0  # Left alignment
+)
+QUESTION_STYLE = ParagraphStyle(
+    'QuestionStyle',
+    fontName='Helvetica',
+    fontSize=12,
+    textColor=black,
+    leftIndent=0,
+    rightIndent=0,
+    spaceAfter=3,
+    spaceBefore=3,
+    alignment=0  # Left alignment
+)
+DISCUSSION_QUESTION_STYLE = ParagraphStyle(
+    'DiscussionQuestionStyle',
+    fontName='Helvetica-Oblique',
+    fontSize=12,
+    textColor=black,
+    leftIndent=0,
+    rightIndent=0,
+    spaceAfter=6,
+    spaceBefore=6,
+    alignment=0  # Left alignment
+)
+
+EXTRACT_STYLE = ParagraphStyle('ExtractStyle', rightIndent=30 * mm)
+TASK_HEADING_STYLE = ParagraphStyle('TaskHeadingStyle', fontName='Helvetica-Bold', fontSize=12, leading=14)
+ANSWERS_HEADING_STYLE = ParagraphStyle('AnswersHeadingStyle', fontName='Helvetica-Bold', fontSize=16, leading=20)
+ANSWER_STYLE = ParagraphStyle('AnswerStyle', fontName='Helvetica', fontSize=12, leading=5 * mm)
+QUESTION_ROW_STYLE = TableStyle([
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+    ('FONT', (1, 0), (1, 0), 'Helvetica-Bold', 12),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('TOPPADDING', (0, 0), (-1, -1), 0),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5 * mm),
+])
+
+X_START = 20 * mm
+Y_START = 270 * mm
+LINE_HEIGHT = 5 * mm
+BOTTOM_MARGIN = 20 * mm
+FRAME_WIDTH = 180 * mm
+CONTINUATION_TOP = Y_START  # Where content resumes below the header on continuation pages
+
+# Fixed wording shared by the PDF layout and the format-neutral blocks of to_blocks()
+PREPARATION_TITLE = "Preparation task"
+MATCHING_HEADERS = ("Items", "Answers")
+MIDDLE_TASK_TITLE = "Intermediate Extract"
+MIDDLE_TASK_INSTRUCTION = "Read the following extract:"
+TRUE_FALSE_HEADING = "Intermediate Task 1"
+TRUE_FALSE_INSTRUCTION = "Determine whether the following statements are True or False based on the extract:"
+TRUE_FALSE_LABEL = "True/False"
+DISCUSSION_TITLE = "Discussion Task"
+DISCUSSION_INSTRUCTION = "Discuss the following question:"
+
+
+class LayoutTemplate:
+    """
+    Static page furniture for a task type (titles, fixed instructions, headers).
+    The furniture is drawn into a form XObject the first time it is used on a canvas, and every
+    later page of that document only references the form, so it is laid out once and stored once.
+    """
+    def __init__(self, name: str, draw_function):
+        """
+        Args:
+            name (str): Unique name of the template
+            draw_function (callable): Draws the furniture, called as draw_function(canvas, *args)
+        """
+        self.name = name
+        self.draw_function = draw_function
+
+    def draw(self, can: canvas.Canvas, *args):
+        """
+        Draw the template onto the canvas. Templates whose furniture depends on arguments (e.g. the
+        header text) get one form per distinct set of arguments.
+        """
+        form_name = self.name
+        if args:
+            form_name += "_" + hashlib.sha1(repr(args).encode("utf-8")).hexdigest()[:16]
+        if not can.hasForm(form_name):
+            can.beginForm(form_name)
+            can.saveState()  # Keep the canvas' font state in step with the page once the form ends
+            self.draw_function(can, *args)
+            can.restoreState()
+            can.endForm()
+        can.doForm(form_name)
+
+
+def _draw_header(can, skill, difficulty, topic):
+    can_width = A4[0]
+    can.setFont("Helvetica", 12)
+    can.drawRightString(can_width - 20 * mm, 287 * mm, f"{skill}: {difficulty}")
+    can.setFont("Helvetica", 18)
+    can.drawRightString(can_width - 20 * mm, 280 * mm, topic)
+
+
+def _draw_preparation_furniture(can):
+    can.setFont("Helvetica-Bold", 16)
+    can.drawString(X_START, Y_START, PREPARATION_TITLE)
+    can.setFont("Helvetica-Bold", 12)
+    can.drawString(X_START, Y_START - 4 * LINE_HEIGHT, MATCHING_HEADERS[0])
+    can.drawString(X_START + 70 * mm, Y_START - 4 * LINE_HEIGHT, MATCHING_HEADERS[1])
+
+
+def _draw_middle_task_furniture(can):
+    can.setFont("Helvetica-Bold", 16)
+    can.drawString(X_START, Y_START, MIDDLE_TASK_TITLE)
+    can.setFont("Helvetica", 12)
+    can.drawString(X_START, Y_START - LINE_HEIGHT*2, MIDDLE_TASK_INSTRUCTION)
+
+
+def _draw_discussion_furniture(can):
+    can.setFont("Helvetica-Bold", 16)
+    can.drawString(X_START, Y_START, DISCUSSION_TITLE)
+    can.setFont("Helvetica", 12)
+    can.drawString(X_START, Y_START - LINE_HEIGHT*2, DISCUSSION_INSTRUCTION)
+
+
+HEADER_TEMPLATE = LayoutTemplate("Header", _draw_header)
+PREPARATION_TEMPLATE = LayoutTemplate("PreparationTask", _draw_preparation_furniture)
+MIDDLE_TASK_TEMPLATE = LayoutTemplate("MiddleTask", _draw_middle_task_furniture)
+DISCUSSION_TEMPLATE = LayoutTemplate("DiscussionTask", _draw_discussion_furniture)
+
+
+def shuffled_permutation(size: int, seed: int) -> list:
+    """
+    A reproducible random permutation of range(size): position p of the shuffled list shows original index permutation[p].
+    """
+    permutation = list(range(size))
+    random.Random(seed).shuffle(permutation)
+    return permutation
+
+
+def invert_permutation(permutation: list) -> list:
+    """
+    The inverse of a permutation in one pass: inverse[i] is the position original index i was moved to.
+    """
+    inverse = [0] * len(permutation)
+    for position, index in enumerate(permutation):
+        inverse[index] = position
+    return inverse
+
+
+def answer_label(index: int) -> str:
+    """
+    Letter label for an answer position: a, b, ..., z, aa, ab, ... so large sets keep unique labels.
+    """
+    label = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(97 + remainder) + label
+    return label
+
 
 class Task:
-    def __init__(self, skill: str, difficulty: str, topic: str, content_dict: Union[dict, str, BaseModel] = None):
+    def __init__(self, skill: str, difficulty: str, topic: str, content_dict: Union[dict, str, BaseModel] = None, seed: int = None):
         """
         Parent class to create different types of tasks for language learning materials.
         
@@ -23,10 +197,13 @@ class Task:
             difficulty (str): The difficulty level (e.g., "A1", "A2", "B1", "B2", "C1")
             topic (str): The topic of the exercise
             content_dict (Union[dict, str]): The content for the task. This can be a dictionary or a string depending on the task type.
+            seed (int, optional): Seed for any randomised layout, e.g. answer order. Derived from the content if None,
+                so the same content always renders the same PDF.
         """
         self.skill = skill
         self.difficulty = difficulty
         self.topic = topic
+        self.seed = seed
         if content_dict is None:
             print("No content dictionary provided. We will attempt to generate it now...")
         self.content_dict = content_dict.answer if isinstance(content_dict, (ResponsePrep, ResponseMidTask, ResponseMidTaskQuestionsMCQ, ResponseDiscussion)) else content_dict
@@ -36,16 +213,123 @@ class Task:
            
     def create_pdf_initial(self, packet: BytesIO = None) -> BytesIO:
         self.packet = BytesIO() if packet is None else packet
-        self.can = canvas.Canvas(self.packet, pagesize=A4)
-        can_width = A4[0]
-        can_height = A4[1]
+        self.can = canvas.Canvas(self.packet, pagesize=A4, invariant=1)  # No timestamps, so the bytes are reproducible
+        self.draw_header()
+        return self.packet
+    
+    def use_canvas(self, can: canvas.Canvas):
+        """
+        Draw onto an existing canvas instead of this task's own buffer, e.g. one shared by every
+        section of a final document. The canvas should be at the start of a fresh page.
+        The caller owns the canvas and is responsible for calling showPage() and save().
+        """
+        self.packet = None
+        self.can = can
+        self.draw_header()
+    
+    def content_hash(self) -> str:
+        """
+        Hash of everything that determines how this task renders, apart from the seed and template version.
+        """
+        payload = json.dumps({"section": self.section, "skill": self.skill, "difficulty": self.difficulty,
+                              "topic": self.topic, "content": self.content_dict}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def render_seed(self) -> int:
+        """
+        The seed used for randomised layout: the explicit seed, or one derived from the content hash.
+        """
+        return self.seed if self.seed is not None else int(self.content_hash()[:16], 16)
+    
+    def render_pdf(self, render_cache=None) -> BytesIO:
+        """
+        Render this task on its own as a PDF, reusing a cached render of the same content,
+        template version and seed if there is one.
+        
+        Args:
+            render_cache (RenderCache, optional): Cache of finished section PDFs
         
+        Returns:
+            BytesIO: PDF content, positioned at the start
+        """
+        with TRACER.span("render_section", section=self.section, topic=self.topic) as span:
+            key = None
+            if render_cache is not None:
+                key = render_cache.make_key(self.content_hash(), TEMPLATE_VERSION, self.render_seed())
+                cached = render_cache.get(key)
+                if cached is not None:
+                    span.set(cache_hit=True, bytes_written=len(cached))
+                    return BytesIO(cached)
+            self.create_pdf_initial()
+            self.draw_content()
+            self.can.save()
+            if key is not None:
+                render_cache.set(key, self.packet.getvalue())
+            span.set(cache_hit=False, bytes_written=len(self.packet.getvalue()))
+            self.packet.seek(0)
+            return self.packet
+    
+    def draw_header(self):
         # Add header information
-        self.can.setFont("Helvetica", 12)
-        self.can.drawRightString(can_width - 20 * mm, 287 * mm, f"{self.skill}: {self.difficulty}")
-        self.can.setFont("Helvetica", 18)
-        self.can.drawRightString(can_width - 20 * mm, 280 * mm, self.topic)
-        return self.packet
+        HEADER_TEMPLATE.draw(self.can, self.skill, self.difficulty, self.topic)
+    
+    def draw_content(self):
+        """
+        Draw the task onto the current canvas without saving it. Implemented by each task type.
+        """
+        raise NotImplementedError
+    
+    def to_blocks(self) -> list:
+        """
+        The task's content as format-neutral blocks, for renderers other than the PDF layout.
+        Implemented by each task type; see document_export for the block types.
+        """
+        raise NotImplementedError
+    
+    def to_section(self) -> dict:
+        """
+        The task as one section of a format-neutral document: its header fields and its blocks.
+        """
+        return {"section": self.section, "skill": self.skill, "difficulty": self.difficulty,
+                "topic": self.topic, "blocks": self.to_blocks()}
+    
+    def draw_flowables(self, story: list, top: float = Y_START):
+        """
+        Lay flowables out top to bottom from the given height, in a single pass. Whenever the page
+        is full a new page is started, with the header repeated, and layout continues below it.
+        A flowable that does not fit in the space left, like a long extract, is split so that it
+        fills the page and continues on the next one.
+        
+        Args:
+            story (list): Platypus flowables, e.g. Paragraphs and Tables
+            top (float): Height on the current page to start from
+        
+        Raises:
+            ValueError: If a flowable cannot be split and is taller than a whole page
+        """
+        story = list(story)
+        while story:
+            frame = Frame(X_START, BOTTOM_MARGIN, FRAME_WIDTH, top - BOTTOM_MARGIN,
+                          leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0)
+            placed = False
+            while story:
+                flowable = story[0]
+                if frame.add(flowable, self.can, trySplit=1):
+                    del story[0]
+                    placed = True
+                    continue
+                parts = frame.split(flowable, self.can)
+                if len(parts) > 1 and frame.add(parts[0], self.can, trySplit=1):
+                    story[0:1] = parts[1:]
+                    placed = True
+                break
+            if not story:
+                break
+            if not placed and top == CONTINUATION_TOP:
+                raise ValueError(f"{type(story[0]).__name__} is too large to fit on a page and cannot be split")
+            self.can.showPage()
+            self.draw_header()
+            top = CONTINUATION_TOP
     
     
     def create_output_path(self) -> str:
@@ -62,7 +346,7 @@ class PreparationTask(Task):
     Supports matching exercises with customizable content and formatting.
     """
     
-    def __init__(self, skill: str = None, difficulty: str = None, topic: str = None, content_dict: ResponsePrep = None):
+    def __init__(self, skill: str = None, difficulty: str = None, topic: str = None, content_dict: ResponsePrep = None, seed: int = None):
         """
         Initialize a PreparationTask.
         
@@ -73,33 +357,62 @@ class PreparationTask(Task):
             correct_pairs (dict): Dictionary of correct answer pairs. Will contain a key for the topic, a key for the labels and a key for the matching answers 
             e.g. {'topic': Food, 'labels': ['Food Items', 'Descriptions'], 'correct_pairs': {'Spaghetti': 'pasta dish made from dough and sauce', 'Margherita Pizza': 'Italian dish with tomato, mozzarella, and basil', 'Caesar Salad': 'green salad with croutons, parmesan cheese, and Caesar dressing', 'Tiramisu': 'Italian dessert with layers of coffee-soaked ladyfingers and mascarpone'}}
             task_type (str): Type of task (default: "matching")
+            seed (int, optional): Seed for the answer order. Derived from the content if None.
         """
-        super().__init__(skill, difficulty, topic, content_dict)
+        super().__init__(skill, difficulty, topic, content_dict, seed)
         self.section = "Preparation_Task"
         
     def _shuffle_answers(self):
         """
         Shuffle the answers to create variation in correct answer patterns.
+        The answers are reordered through a permutation of their indices and the key is read off its
+        inverse, so every item keeps its own answer letter even when two answers have the same text.
         
         Returns:
             tuple: (shuffled_items, shuffled_answers, answer_key)
         """
         items = list(self.content_dict["correct_pairs"].keys())
         answers = list(self.content_dict["correct_pairs"].values())
-        print("Original answers:", answers)
-        print("Original items:", items)
         
-        # Shuffle the answers to create variation
-        random.shuffle(answers)
+        # Shuffle the answers to create variation, reproducibly for the same content and seed
+        permutation = shuffled_permutation(len(answers), self.render_seed())
+        positions = invert_permutation(permutation)
+        shuffled_answers = [answers[index] for index in permutation]
         
         # Create answer key mapping
-        answer_key = {}
-        for i, item in enumerate(items):
-            correct_answer = self.content_dict["correct_pairs"][item]
-            answer_index = answers.index(correct_answer)
-            answer_key[str(i+1)] = chr(97 + answer_index)
+        answer_key = {str(i+1): answer_label(position) for i, position in enumerate(positions)}
+        
+        return items, shuffled_answers, answer_key
+    
+    def create_variants(self, count: int) -> list:
+        """
+        Create versions of this task with distinct answer orders, e.g. the A/B/C papers of a test.
+        The first variant is this task's own order; the others use seeds following it.
+        
+        Args:
+            count (int): Number of variants
+        
+        Returns:
+            list: PreparationTask objects sharing this task's content, each with a different answer order
         
-        return items, answers, answer_key
+        Raises:
+            ValueError: If there are fewer possible orders than variants requested
+        """
+        size = len(self.content_dict["correct_pairs"])
+        if count > math.factorial(size):
+            raise ValueError(f"Only {math.factorial(size)} distinct orders exist for {size} answers, {count} variants requested")
+        
+        variants = []
+        seen = set()
+        seed = self.render_seed()
+        while len(variants) < count:
+            permutation = tuple(shuffled_permutation(size, seed))
+            if permutation not in seen:
+                seen.add(permutation)
+                variants.append(PreparationTask(skill=self.skill, difficulty=self.difficulty, topic=self.topic,
+                                                content_dict=self.content_dict, seed=seed))
+            seed += 1
+        return variants
     
     def _create_matching_task_pdf(self, packet: BytesIO = None) -> BytesIO:
         """
@@ -111,46 +424,53 @@ class PreparationTask(Task):
         
         if packet is None:
             self.create_pdf_initial()
+        self.draw_content()
         
-        # Get shuffled content
-        items, answers, self.answer_key = self._shuffle_answers()
+        # Save the canvas
+        self.can.save()
+        return self.packet
+    
+    def _matching_lines(self):
+        """
+        Shuffle the answers and format the matching task's lines.
         
-        # Create formatted lists
+        Returns:
+            tuple: (instruction, formatted items, formatted answers), with self.answer_key set to match
+        """
+        items, answers, self.answer_key = self._shuffle_answers()
         items_formatted = [f"{i+1}. …… {item}" for i, item in enumerate(items)]
-        answers_formatted = [f"{chr(97+i)}. {answer}" for i, answer in enumerate(answers)]
+        answers_formatted = [f"{answer_label(i)}. {answer}" for i, answer in enumerate(answers)]
+        instruction = f"Match the items (1–{len(items)}) with the answers (a–{answer_label(len(items) - 1)})."
+        return instruction, items_formatted, answers_formatted
+    
+    def draw_content(self):
+        """
+        Draw the matching task and its answers onto the current canvas.
+        """
+        # Get shuffled content and formatted lists
+        instruction, items_formatted, answers_formatted = self._matching_lines()
         
         # Positioning
-        x_start = 20 * mm
+        x_start = X_START
         x_answers = x_start + 70 * mm
-        y_start = 270 * mm
-        line_height = 5 * mm
+        y_start = Y_START
+        line_height = LINE_HEIGHT
         
-        # Draw task title
-        self.can.setFont("Helvetica-Bold", 16)
-        self.can.drawString(x_start, y_start, "Preparation task")
+        # Draw task title and column headers
+        PREPARATION_TEMPLATE.draw(self.can)
         
         # Draw instruction
         self.can.setFont("Helvetica", 12)
-        instruction = f"Match the items (1–{len(items)}) with the answers (a–{chr(96+len(items))})."
         self.can.drawString(x_start, y_start - line_height*2, instruction)
         
-        # Draw headers
-        self.can.setFont("Helvetica-Bold", 12)
-        self.can.drawString(x_start, y_start - 4 * line_height, "Items")
-        self.can.drawString(x_answers, y_start - 4 * line_height, "Answers")
-        
         # Draw items and answers
         self.can.setFont("Helvetica", 12)
-        for i in range(len(items)):
+        for i in range(len(items_formatted)):
             self.can.drawString(x_start, y_start - (5 + i) * line_height, items_formatted[i])
             self.can.drawString(x_answers, y_start - (5 + i) * line_height, answers_formatted[i])
         
         # Add answers section
-        self._add_answers_section(self.can, x_start, y_start, line_height, len(items))
-        
-        # Save the canvas
-        self.can.save()
-        return self.packet
+        self._add_answers_section(self.can, x_start, y_start, line_height, len(items_formatted))
 
     def _add_answers_section(self, canvas, x_start, y_start, line_height, num_items):
         """
@@ -179,6 +499,19 @@ class PreparationTask(Task):
             answer_line = f"{i+1}. {self.answer_key[str(i+1)]}"
             canvas.drawString(x_start, answers_y_start - (15 + i * 5) * mm, answer_line)
     
+    def to_blocks(self) -> list:
+        """
+        The matching task and its answers as format-neutral blocks, in the same order as the PDF.
+        """
+        instruction, items_formatted, answers_formatted = self._matching_lines()
+        return [
+            {"type": "heading", "text": PREPARATION_TITLE},
+            {"type": "instruction", "text": instruction},
+            {"type": "table", "header": list(MATCHING_HEADERS), "rows": [list(row) for row in zip(items_formatted, answers_formatted)]},
+            {"type": "answers", "title": "Preparation Task",
+             "lines": [f"{number}. {letter}" for number, letter in self.answer_key.items()]},
+        ]
+    
     def create_pdf(self, output_path=None):
         """
         Create and save the preparation task PDF.
@@ -197,16 +530,10 @@ class PreparationTask(Task):
         
         # Create PDF content
         pdf_content = self._create_matching_task_pdf()
-        self.packet.seek(0)
-        self.can.save()
-        # Save PDF
-        new_pdf = PdfReader(pdf_content)
-        output_pdf = PdfWriter()
-        output_pdf.add_page(new_pdf.pages[0])
-
         
+        # Save PDF
         with open(output_path, "wb") as f:
-            output_pdf.write(f)
+            f.write(pdf_content.getvalue())
         
         return output_path
     
@@ -217,7 +544,9 @@ class PreparationTask(Task):
         Returns:
             dict: Answer key mapping question numbers to answer letters
         """
-        
+        if not self.answer_key and self.content_dict is not None:
+            # Not drawn yet, or the render came from the cache; the shuffle is seeded so this matches the PDF
+            _, _, self.answer_key = self._shuffle_answers()
         return self.answer_key.copy()
     
     def __str__(self):
@@ -229,7 +558,7 @@ class MiddleTask(Task):
     """Class for building English language reading tasks.
     Supports various task types such as extract, true/false questions, multiple choice questions, and ordering tasks.
     """
-    def __init__(self, skill: str = None, difficulty: str = None, topic: str = None, task_types: list = None, content_dict: Union[ResponseMidTask, dict] = None):
+    def __init__(self, skill: str = None, difficulty: str = None, topic: str = None, task_types: list = None, content_dict: Union[ResponseMidTask, dict] = None, seed: int = None):
         """
         Initialize the MiddleTask with the given parameters.
         Args:
@@ -239,8 +568,9 @@ class MiddleTask(Task):
             task_types (list): List of task types to include (e.g., ["TF", "MCQ", "Ordering"])
             extract (str): The text extract for the reading task
             content_dict (Union[ResponseMidTask, ResponseMidTask2, dict], optional): Additional content for the task.
+            seed (int, optional): Seed for any randomised layout. Derived from the content if None.
         """
-        super().__init__(skill, difficulty, topic, content_dict)
+        super().__init__(skill, difficulty, topic, content_dict, seed)
         self.task_types = task_types
         self.section = "Middle_Task"
         if content_dict is None:
@@ -263,12 +593,9 @@ class MiddleTask(Task):
         pass
         
     def process_extract(self) -> Paragraph:
-        print("Processing extract...")
         splitted_extract = self.extract.split("\n") # This will give a list of lines
-        processed_extract = "<BR/>".join(splitted_extract)
-        p1 = Paragraph(processed_extract)
-        p1.wrapOn(self.can, 150*mm, 250*mm)
-        return p1
+        processed_extract = "<BR/>".join(escape(line) for line in splitted_extract)
+        return Paragraph(processed_extract, EXTRACT_STYLE)
     
     def create_pdf(self, output_path=None, packet=None):
         # If packet is provided, append to existing PDF
@@ -281,140 +608,93 @@ class MiddleTask(Task):
 
         pdf_content = self._create_pdf()
         # Save PDF
-        new_pdf = PdfReader(pdf_content)
-        output_pdf = PdfWriter()
-        output_pdf.add_page(new_pdf.pages[0])
-        
         with open(output_path, "wb") as f:
-            f.write(pdf_content.read())
+            f.write(pdf_content.getvalue())
         
         return output_path
         
         
     
     def _create_pdf(self, packet: BytesIO = None) -> BytesIO:
-        print(f"Creating PDF for {self.task_types[0]} task...")
-        
         if packet is None:
             self.create_pdf_initial()
+        self.draw_content()
         
+        # Save the canvas
+        self.can.save()
+        return self.packet
+    
+    def draw_content(self):
+        """
+        Draw the extract, the True/False questions and the answers page onto the current canvas.
+        """
         # Positioning
-        x_start = 20 * mm
-        x_answers = x_start + 70 * mm
-        y_start = 270 * mm
-        line_height = 5 * mm
-        
-        # Draw task title
-        self.can.setFont("Helvetica-Bold", 16)
-        self.can.drawString(x_start, y_start, "Intermediate Extract")
-        
-        # Draw instruction
-        self.can.setFont("Helvetica", 12)
-        instruction = f"Read the following extract:"
-        self.can.drawString(x_start, y_start - line_height*2, instruction)
-        
-        # Draw extract and get its height
-        extract_paragraph = self.process_extract()
-        extract_height = extract_paragraph.height
-        extract_y_position = y_start - line_height*3 - extract_height  # Starting position for extract
-        extract_paragraph.drawOn(self.can, x_start, extract_y_position)
-        
-        # Calculate next position AFTER the extract
-        # Get the actual height of the paragraph
-        
-        next_y_position = extract_y_position  # Add spacing
-        
-        # Draw headers (now positioned dynamically)
-        next_y_position -= line_height * 2
-        self.can.setFont("Helvetica-Bold", 12)
-        self.can.drawString(x_start, next_y_position, "Intermediate Task 1")
-        
-        # Draw items
-        next_y_position -= line_height * 3
-        
-        # Create paragraph style for instruction text
-        instruction_style = ParagraphStyle(
-            'InstructionStyle',
-            fontName='Helvetica',
-            fontSize=12,
-            textColor=black,
-            leftIndent=0,
-            rightIndent=0,
-            spaceAfter=6,
-            spaceBefore=3,
-            alignment=0  # Left alignment
-        )
-        
-        # Draw instruction with text wrapping
-        instruction_text = "Determine whether the following statements are True or False based on the extract:"
-        instruction_paragraph = Paragraph(instruction_text, instruction_style)
-        instruction_paragraph.wrapOn(self.can, 150*mm, 50*mm)
-        instruction_paragraph.drawOn(self.can, x_start, next_y_position)
-        next_y_position -= instruction_paragraph.height + line_height
-        
-        # Create paragraph style for wrapped questions
-        question_style = ParagraphStyle(
-            'QuestionStyle',
-            fontName='Helvetica',
-            fontSize=12,
-            textColor=black,
-            leftIndent=0,
-            rightIndent=0,
-            spaceAfter=3,
-            spaceBefore=3,
-            alignment=0  # Left alignment
-        )
-        
-        for i, (question, answer) in enumerate(zip(self.questions, self.answers)):
-            # Create wrapped question text
-            question_text = f"{i+1}. {question}"
-            question_paragraph = Paragraph(question_text, question_style)
-            question_paragraph.wrapOn(self.can, 120*mm, 50*mm)  # Available width and height
-            
-            # Draw the question paragraph
-            question_paragraph.drawOn(self.can, x_start, next_y_position)
-            
-            # Draw True/False label
-            self.can.drawRightString(x_start + 180*mm, next_y_position, "True/False")
-            
-            # Move to next position (account for wrapped text height)
-            next_y_position -= question_paragraph.height + line_height
+        y_start = Y_START
+        line_height = LINE_HEIGHT
+        
+        # Draw task title and instruction
+        MIDDLE_TASK_TEMPLATE.draw(self.can)
+        
+        # Lay out the extract and questions in frames, continuing onto new pages as needed
+        story = [
+            self.process_extract(),
+            Spacer(0, line_height * 2),
+            Paragraph(TRUE_FALSE_HEADING, TASK_HEADING_STYLE),
+            Spacer(0, line_height),
+            Paragraph(TRUE_FALSE_INSTRUCTION, INSTRUCTION_STYLE),
+        ]
+        for i, question in enumerate(self.questions):
+            story.append(self._question_row(f"{i+1}. {escape(question)}"))
+        self.draw_flowables(story, top=y_start - line_height * 3)
         
         # Draw Answers section
-        # start a new page for the Answers section
+        # start a new page for the Answers section, with the header repeated
         self.can.showPage()
-        # redraw header on the new page
-        can_width, can_height = A4
-        self.can.setFont("Helvetica", 12)
-        self.can.drawRightString(can_width - 20 * mm, 287 * mm, f"{self.skill}: {self.difficulty}")
-        self.can.setFont("Helvetica", 18)
-        self.can.drawRightString(can_width - 20 * mm, 280 * mm, self.topic)
-        # reset vertical position for the new page
-        next_y_position = y_start
-        self.can.setFont("Helvetica-Bold", 16)
-        next_y_position -= line_height * 8
-        self.can.drawString(x_start, next_y_position, "Answers:")
-        self.can.setFont("Helvetica", 12)
-        next_y_position -= line_height * 2
-        for answer in self.answers:
-            self.can.drawString(x_start, next_y_position, f"{'True' if answer else 'False'}")
-            next_y_position -= line_height
-
-        # Save the canvas
-        self.can.save()
-        return self.packet
+        self.draw_header()
+        answers_story = [Paragraph("Answers:", ANSWERS_HEADING_STYLE), Spacer(0, line_height)]
+        for i, answer in enumerate(self.answers):
+            answers_story.append(Paragraph(f"{i+1}. {'True' if answer else 'False'}", ANSWER_STYLE))
+        self.draw_flowables(answers_story, top=y_start - line_height * 7)
+    
+    def to_blocks(self) -> list:
+        """
+        The extract, the True/False questions and the answers as format-neutral blocks.
+        """
+        blocks = [
+            {"type": "heading", "text": MIDDLE_TASK_TITLE},
+            {"type": "instruction", "text": MIDDLE_TASK_INSTRUCTION},
+            {"type": "text", "text": self.extract},
+            {"type": "subheading", "text": TRUE_FALSE_HEADING},
+            {"type": "instruction", "text": TRUE_FALSE_INSTRUCTION},
+        ]
+        for i, question in enumerate(self.questions):
+            blocks.append({"type": "question", "text": f"{i+1}. {question}", "label": TRUE_FALSE_LABEL})
+        blocks.append({"type": "page_break"})  # The PDF starts the answers on a new page too
+        blocks.append({"type": "answers", "title": None,
+                       "lines": [f"{i+1}. {'True' if answer else 'False'}" for i, answer in enumerate(self.answers)]})
+        return blocks
+    
+    def _question_row(self, question_text: str) -> Table:
+        """
+        A question with its True/False label aligned on the right, as one flowable.
+        """
+        row = Table([[Paragraph(question_text, QUESTION_STYLE), TRUE_FALSE_LABEL]],
+                    colWidths=[120*mm, FRAME_WIDTH - 120*mm])
+        row.setStyle(QUESTION_ROW_STYLE)
+        return row
         
     pass
 
 class Discussion(Task):
-    def __init__(self, topic: str = None, content_dict: Union[ResponseDiscussion, dict] = None):
+    def __init__(self, topic: str = None, content_dict: Union[ResponseDiscussion, dict] = None, seed: int = None):
         """
         Initialize the Discussion task with the given parameters.
         Args:
             topic (str): The topic of the discussion
             content_dict (Union[ResponseDiscussion, dict], optional): Additional content for the task.
+            seed (int, optional): Seed for any randomised layout. Derived from the content if None.
         """
-        super().__init__(skill="Speaking", difficulty="A2", topic=topic, content_dict=content_dict)
+        super().__init__(skill="Speaking", difficulty="A2", topic=topic, content_dict=content_dict, seed=seed)
         self.content_dict = content_dict.answer if isinstance(content_dict, ResponseDiscussion) else content_dict
         self.question = self.content_dict.get("question", "") if self.content_dict else ""
         self.section = "Discussion_Task"
@@ -430,55 +710,48 @@ class Discussion(Task):
         output_path = output_path if output_path else self.create_output_path()
         pdf_content = self.generate_pdf_content()
         # Save PDF
-        new_pdf = PdfReader(pdf_content)
-        output_pdf = PdfWriter()
-        output_pdf.add_page(new_pdf.pages[0])
         if output_path:
             with open(output_path, "wb") as f:
-                f.write(pdf_content.read())
+                f.write(pdf_content.getvalue())
         return pdf_content
     
     def generate_pdf_content(self, packet: BytesIO = None):
         if packet:
-            self.packet = packet
-            
-        # Positioning
-        x_start = 20 * mm
-        y_start = 270 * mm
-        line_height = 5 * mm
-        
-        # Draw task title
-        self.can.setFont("Helvetica-Bold", 16)
-        self.can.drawString(x_start, y_start, "Discussion Task")
+            self.create_pdf_initial(packet)
+        self.draw_content()
         
-        # Draw instruction
-        self.can.setFont("Helvetica", 12)
-        instruction = f"Discuss the following question:"
-        self.can.drawString(x_start, y_start - line_height*2, instruction)
+        # Save the canvas
+        self.can.save()
+        self.packet.seek(0)
+        return self.packet
+    
+    def draw_content(self):
+        """
+        Draw the discussion question onto the current canvas.
+        """
+        # Positioning
+        x_start = X_START
+        y_start = Y_START
+        line_height = LINE_HEIGHT
         
-        # Create paragraph style for wrapped text
-        question_style = ParagraphStyle(
-            'QuestionStyle',
-            fontName='Helvetica-Oblique',
-            fontSize=12,
-            textColor=black,
-            leftIndent=0,
-            rightIndent=0,
-            spaceAfter=6,
-            spaceBefore=6,
-            alignment=0  # Left alignment
-        )
+        # Draw task title and instruction
+        DISCUSSION_TEMPLATE.draw(self.can)
         
         # Draw question with text wrapping
-        question_paragraph = Paragraph(self.question, question_style)
+        question_paragraph = Paragraph(self.question, DISCUSSION_QUESTION_STYLE)
         question_paragraph.wrapOn(self.can, 150*mm, 200*mm)  # Available width and height
         question_y_position = y_start - line_height*4
         question_paragraph.drawOn(self.can, x_start, question_y_position)
-        
-        # Save the canvas
-        self.can.save()
-        self.packet.seek(0)
-        return self.packet
+    
+    def to_blocks(self) -> list:
+        """
+        The discussion question as format-neutral blocks.
+        """
+        return [
+            {"type": "heading", "text": DISCUSSION_TITLE},
+            {"type": "instruction", "text": DISCUSSION_INSTRUCTION},
+            {"type": "emphasis", "text": self.question},
+        ]
 
 # Example usage
 if __name__ == "__main__":
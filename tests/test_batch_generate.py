@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("reportlab")
+pytest.importorskip("ollama")
+
+from batch_generate import load_manifest
+
+
+def test_duplicate_output_names_are_rejected(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("topic,skill,difficulty,output_name\n"
+                        "Food,Reading,A1,food\n"
+                        "Travel,Reading,A2,travel.pdf\n"
+                        "Food again,Reading,B1,food.pdf\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=r"'food\.pdf' \(rows 1, 3\)"):
+        load_manifest(str(manifest))
+
+
+def test_default_output_names_come_from_the_topic(tmp_path):
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text('{"topic": "Shopping list"}\n{"topic": "Train times", "output_name": "trains"}\n', encoding="utf-8")
+    assert [row["output_name"] for row in load_manifest(str(manifest))] == ["Shopping_list.pdf", "trains.pdf"]
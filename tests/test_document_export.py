@@ -0,0 +1,72 @@
+import os
+from html.parser import HTMLParser
+import pytest
+
+pytest.importorskip("reportlab")
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("ollama")
+
+from benchmark_pipeline import FakeResourceCreator
+from british_council_final_document import BritishCouncilFinalDocument
+from document_export import export_document, export_path
+from tasks import PreparationTask, MiddleTask, Discussion
+
+
+class TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def normalise(text: str) -> str:
+    return " ".join(text.split())
+
+
+def block_texts(model: dict) -> list:
+    """Every piece of text the blocks of a document model carry."""
+    texts = []
+    for section in model["sections"]:
+        texts.extend([section["topic"], f"{section['skill']}: {section['difficulty']}"])
+        for block in section["blocks"]:
+            if block["type"] == "table":
+                texts.extend(block["header"])
+                texts.extend(cell for row in block["rows"] for cell in row)
+            elif block["type"] == "answers":
+                texts.extend(block["lines"])
+            elif block["type"] == "text":
+                texts.extend(block["text"].split("\n"))
+            elif block["type"] != "page_break":
+                texts.append(block["text"])
+    return [normalise(text) for text in texts if text.strip()]
+
+
+def test_pdf_and_html_have_the_same_content(tmp_path):
+    topic = "Visiting a museum"
+    document = BritishCouncilFinalDocument(
+        preparation_task=PreparationTask(skill="Reading", difficulty="A2", topic=topic),
+        middle_task=MiddleTask(skill="Reading", difficulty="A2", topic=topic, task_types=["tf"]),
+        discussion=Discussion(topic=topic),
+        creator=FakeResourceCreator(topic),
+    )
+    document.generate_content(concurrent=False)
+    fp = os.path.join(str(tmp_path), "museum.pdf")
+    model = document.to_document_model(fp)
+    results = export_document(model, fp, ["pdf", "html"])
+    assert [result["ok"] for result in results] == [True, True], results
+
+    with fitz.open(fp) as doc:
+        pdf_text = normalise(" ".join(page.get_text() for page in doc))
+    parser = TextExtractor()
+    with open(export_path(fp, "html"), encoding="utf-8") as f:
+        parser.feed(f.read())
+    html_text = normalise(" ".join(parser.parts))
+
+    texts = block_texts(model)
+    assert len(texts) > 20
+    missing_from_pdf = [text for text in texts if text not in pdf_text]
+    missing_from_html = [text for text in texts if text not in html_text]
+    assert missing_from_pdf == []
+    assert missing_from_html == []
@@ -0,0 +1,32 @@
+import os
+import pytest
+
+pytest.importorskip("fitz")
+
+from corpus_ingest import find_pdfs, ingest_pdf
+from example_retrieval import ExampleRetriever
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def retriever():
+    # The A1 reading resources are enough for a small index
+    paths = [path for path in find_pdfs(os.path.join(REPO_ROOT, "resources", "Reading")) if "-A1-" in path]
+    return ExampleRetriever([ingest_pdf(path) for path in paths])
+
+
+def test_reading_text_examples_for_middle_task(retriever):
+    examples = retriever.format_examples("Flights at an airport", "Reading Text", skill="Reading", level="A1")
+    assert 'Existing reading text on "An airport departures board"' in examples
+    assert "DEPARTURES" in examples
+
+
+def test_middle_task_prompt_gets_examples(retriever, monkeypatch):
+    pytest.importorskip("ollama")
+    from running_ollama_easy import ResourceCreator
+    creator = ResourceCreator(topic="Flights at an airport", difficulty="A1", skill="Reading", retriever=retriever)
+    requested = []
+    monkeypatch.setattr(creator, "_request", lambda template, response_model, example_section=None: requested.append(example_section))
+    creator.create_middle_task()
+    assert "DEPARTURES" in creator._examples(requested[0])
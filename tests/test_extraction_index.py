@@ -0,0 +1,24 @@
+import os
+import shutil
+import pytest
+
+pytest.importorskip("fitz")
+
+from extraction_index import ExtractionIndex
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AIRPORT_PDF = os.path.join(REPO_ROOT, "resources", "Reading", "LearnEnglish-Reading-A1-An-airport-departures-board.pdf")
+
+
+def test_get_normalises_the_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("resources", "Reading"))
+    shutil.copy(AIRPORT_PDF, os.path.join("resources", "Reading", "airport.pdf"))
+    with ExtractionIndex("index.sqlite") as index:
+        assert index.refresh("./resources", workers=1)["added"] == 1
+        for path in ("resources/Reading/airport.pdf", "./resources/Reading/airport.pdf",
+                     "resources/Speaking/../Reading/airport.pdf"):
+            record = index.get(path)
+            assert record is not None, path
+            assert record["title"] == "An airport departures board"
+        assert index.get("resources/Reading/missing.pdf") is None
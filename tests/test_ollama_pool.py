@@ -0,0 +1,55 @@
+import httpx
+import pytest
+
+pytest.importorskip("ollama")
+
+from ollama_pool import OllamaEndpointPool
+
+
+class FlakyClient:
+    """Fails the first `failures` requests to connect, then answers."""
+
+    def __init__(self, name: str, failures: int = 0):
+        self.name = name
+        self.failures = failures
+        self.calls = 0
+
+    def chat(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise httpx.ConnectError(f"{self.name} refused the connection")
+        return self.name
+
+
+def pool_of(*clients) -> OllamaEndpointPool:
+    pool = OllamaEndpointPool([f"http://host-{i}:11434" for i in range(len(clients))], cooldown=60.0)
+    for endpoint, client in zip(pool.endpoints, clients):
+        endpoint.client = client
+    return pool
+
+
+def test_single_endpoint_is_still_tried_during_its_cooldown():
+    pool = pool_of(FlakyClient("only", failures=1))
+    with pytest.raises(httpx.ConnectError):
+        pool.chat(model="m", messages=[])
+    assert not pool.endpoints[0].healthy(pool.endpoints[0].down_until - 1)
+    # Within the cooldown, the only endpoint is used instead of failing without a request
+    assert pool.chat(model="m", messages=[]) == "only"
+
+
+def test_endpoint_whose_cooldown_ends_first_is_used_when_all_are_down():
+    first, second = FlakyClient("first", failures=1), FlakyClient("second", failures=1)
+    pool = pool_of(first, second)
+    with pytest.raises(httpx.ConnectError):
+        pool.chat(model="m", messages=[])
+    pool.endpoints[1].down_until -= 30  # The second endpoint comes back sooner
+    assert pool.chat(model="m", messages=[]) == "second"
+    assert first.calls == 1
+
+
+def test_failed_endpoint_is_skipped_while_another_is_healthy():
+    flaky, healthy = FlakyClient("flaky", failures=1), FlakyClient("healthy")
+    pool = pool_of(flaky, healthy)
+    assert pool.chat(model="m", messages=[]) == "healthy"
+    assert pool.chat(model="m", messages=[]) == "healthy"
+    assert flaky.calls == 1
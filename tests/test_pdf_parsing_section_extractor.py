@@ -0,0 +1,42 @@
+import os
+import pytest
+
+pytest.importorskip("fitz")
+
+from corpus_ingest import ingest_pdf
+from pdf_parsing_section_extractor import SectionExtractor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AIRPORT_PDF = os.path.join(REPO_ROOT, "resources", "Reading", "LearnEnglish-Reading-A1-An-airport-departures-board.pdf")
+
+
+def test_resource_pdf_answers_and_word_mapping():
+    record = ingest_pdf(AIRPORT_PDF)
+    assert record["error"] is None
+    assert sorted(record["sections"]) == ["Answers", "Discussion", "Preparation Task", "Reading Text", "Task 1", "Task 2"]
+    assert record["answers"] == {"1": "f", "2": "d", "3": "e", "4": "b", "5": "c", "6": "h", "7": "a", "8": "g"}
+    assert record["word_mapping"]["Beijing"] == "China"
+    assert record["word_mapping"]["Christchurch"] == "New Zealand"
+    assert len(record["word_mapping"]) == 8
+    assert record["labels"] == ["Cities", "Countries"]
+    # Neither the reading text nor the answer key leaks into the preparation task
+    assert "DEPARTURES" not in record["sections"]["Preparation Task"]
+    assert "1. f" not in record["sections"]["Preparation Task"]
+    assert "DEPARTURES" in record["sections"]["Reading Text"]
+
+
+def test_regular_weight_banners_start_sections():
+    extractor = SectionExtractor()
+    extractor.feed_line("Preparation task ", True, 14)
+    extractor.feed_line("1. …… Beijing ", False, 12)
+    extractor.feed_line("Reading text: An airport departures board ", False, 17)
+    extractor.feed_line("Answers ", False, 12)  # Body-sized, so a word in the text rather than a heading
+    extractor.feed_line("Answers ", False, 16)
+    extractor.feed_line("1. f ", False, 12)
+    extractor.feed_line("© 2019 British Council ", False, 11)
+    assert extractor.section_texts() == {
+        "Preparation Task": "1. …… Beijing",
+        "Reading Text": "Answers",
+        "Answers": "1. f",
+    }
+    assert extractor.done
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("ollama")
+
+from running_ollama_easy import ResourceCreator, ResponseDiscussion
+from streaming_json import StreamAbortedError
+
+
+class EmptyStream:
+    def __init__(self):
+        self.closed = False
+
+    def __iter__(self):
+        return iter(())
+
+    def close(self):
+        self.closed = True
+
+
+class EmptyStreamEndpoint:
+    """Stands in for an endpoint pool whose streamed responses end before the first chunk."""
+
+    def __init__(self):
+        self.streams = []
+
+    def chat(self, **kwargs):
+        self.streams.append(EmptyStream())
+        return self.streams[-1]
+
+
+def test_empty_stream_raises_a_clear_error():
+    endpoint = EmptyStreamEndpoint()
+    creator = ResourceCreator(topic="Travel", stream=True, endpoints=endpoint)
+    with pytest.raises(StreamAbortedError, match="empty stream"):
+        creator._chat_stream([{"role": "user", "content": "Hi"}], ResponseDiscussion.model_json_schema(), "ResponseDiscussion")
+    assert endpoint.streams[0].closed
+
+
+def test_empty_stream_is_retried_then_reported():
+    endpoint = EmptyStreamEndpoint()
+    creator = ResourceCreator(topic="Travel", stream=True, endpoints=endpoint, max_regenerations=2)
+    with pytest.raises(StreamAbortedError, match="empty stream"):
+        creator.create_discussion()
+    assert len(endpoint.streams) == 3
+    assert creator.repair_stats.counts["aborted"] == 3
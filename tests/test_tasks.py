@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("reportlab")
+fitz = pytest.importorskip("fitz")
+
+from tasks import MiddleTask, TRUE_FALSE_HEADING
+
+
+def middle_task(extract_lines: int) -> MiddleTask:
+    extract = "\n".join(f"Line {i + 1} of a long extract about planning a trip to the seaside." for i in range(extract_lines))
+    content = {"topic": "A long extract", "extract": extract, "questions": ["The trip is planned.", "The extract is short."], "answers": [True, False]}
+    return MiddleTask(skill="Reading", difficulty="B1", topic="A long extract", content_dict=content)
+
+
+def page_texts(packet) -> list:
+    with fitz.open(stream=packet.getvalue(), filetype="pdf") as doc:
+        return [page.get_text() for page in doc]
+
+
+def test_extract_longer_than_a_page_is_split_across_pages():
+    pages = page_texts(middle_task(150)._create_pdf())
+    # At least two pages of extract before the answers page, each with the header repeated
+    assert len(pages) >= 4
+    assert all("A long extract" in text for text in pages)
+    text = "\n".join(pages)
+    for i in (1, 75, 150):
+        assert text.count(f"Line {i} of a long extract") == 1
+    assert TRUE_FALSE_HEADING in text
+    assert "Answers:" in pages[-1]
+
+
+def test_extract_flows_from_the_first_page():
+    # Slightly too long for the space below the title, but short enough for a continuation page
+    pages = page_texts(middle_task(57)._create_pdf())
+    # The first page is filled with the start of the extract rather than left empty below the title
+    assert "Line 1 of a long extract" in pages[0]
+    assert "Line 57 of a long extract" in pages[1]
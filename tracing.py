@@ -0,0 +1,217 @@
+"""
+Lightweight tracing of the generation pipeline.
+Work is wrapped in spans (a model call, a section render, a merge, a whole document) that carry
+attributes such as the model, topic, token counts or bytes written. Finished spans go to the
+configured exporters: a JSONL file with one span per line for per-document analysis, and/or
+Prometheus-style aggregates served over HTTP. With no exporter configured, spans cost almost nothing.
+
+Example:
+    configure_tracing(jsonl_path="trace.jsonl", prometheus_port=9464)
+    with TRACER.span("document", topic="Asking for help") as span:
+        ...
+        span.set(bytes_written=12345)
+"""
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, attributes: dict, parent=None):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        """Add or update attributes of the span."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class JSONLExporter:
+    """Appends every finished span to a JSONL file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusExporter:
+    """
+    Aggregates finished spans into a duration histogram per span name and status, and a counter
+    per numeric attribute (e.g. prompt_tokens, bytes_written), in the Prometheus text format.
+    """
+
+    def __init__(self, prefix: str = "worksheet"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.histograms = {}  # (name, status) -> {"buckets": [...], "sum": float, "count": int}
+        self.counters = {}  # (name, attribute) -> float
+
+    def export(self, span: Span):
+        with self._lock:
+            histogram = self.histograms.setdefault((span.name, span.status),
+                                                   {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += span.duration
+            histogram["count"] += 1
+            for attribute, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self.counters[(span.name, attribute)] = self.counters.get((span.name, attribute), 0) + value
+
+    def render(self) -> str:
+        metric = f"{self.prefix}_span_duration_seconds"
+        lines = [f"# TYPE {metric} histogram"]
+        with self._lock:
+            for (name, status), histogram in sorted(self.histograms.items()):
+                labels = f'span="{name}",status="{status}"'
+                for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+                lines.append(f"{metric}_sum{{{labels}}} {histogram['sum']}")
+                lines.append(f"{metric}_count{{{labels}}} {histogram['count']}")
+            for (name, attribute), value in sorted(self.counters.items()):
+                counter = f"{self.prefix}_{attribute}_total"
+                lines.append(f'{counter}{{span="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464) -> ThreadingHTTPServer:
+        """
+        Serve the metrics at http://localhost:port/metrics from a background thread.
+
+        Returns:
+            ThreadingHTTPServer: The running server. Call shutdown() to stop it.
+        """
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class Tracer:
+    def __init__(self, exporters: list = None):
+        self.exporters = list(exporters or [])
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Time the enclosed block as a span nested under the current one. The span is marked as an
+        error, and the exception re-raised, if the block raises.
+        """
+        span = Span(name, attributes, _current_span.get())
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self._export(span)
+
+    def record(self, name: str, duration: float, **attributes):
+        """
+        Record a span for work timed elsewhere, e.g. in a worker process, as a child of the current span.
+        """
+        span = Span(name, attributes, _current_span.get())
+        span.start = time.time() - duration
+        span.duration = duration
+        self._export(span)
+
+    def _export(self, span: Span):
+        for exporter in self.exporters:
+            exporter.export(span)
+
+
+def current_span():
+    """The innermost open span in this context, or None."""
+    return _current_span.get()
+
+
+def annotate(**attributes):
+    """Set attributes on the current span, if there is one."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+# Shared by the whole pipeline; exporters are added by configure_tracing
+TRACER = Tracer()
+
+
+def configure_tracing(jsonl_path: str = None, prometheus_port: int = None) -> Tracer:
+    """
+    Add exporters to the shared tracer.
+
+    Args:
+        jsonl_path (str, optional): File every finished span is appended to
+        prometheus_port (int, optional): Port to serve Prometheus-style metrics on, at /metrics
+    """
+    if jsonl_path:
+        TRACER.add_exporter(JSONLExporter(jsonl_path))
+    if prometheus_port:
+        exporter = PrometheusExporter()
+        exporter.serve(prometheus_port)
+        TRACER.add_exporter(exporter)
+    return TRACER
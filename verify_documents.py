@@ -0,0 +1,212 @@
+"""
+Round-trip verification of generated worksheets.
+Every PDF in an output directory is parsed back with the extraction functions from
+pdf_parsing_section_extractor, and what they recover (title, level, preparation task answer key
+and word mapping, True/False answers, discussion question) is compared with the content the
+document was rendered from, read from the JSON sidecar batch_generate.py saves next to it.
+Documents are checked in a process pool, so a whole batch can be QA'd without opening a PDF by hand.
+
+Example:
+    python verify_documents.py batch_output --workers 8 --output verification.jsonl
+"""
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from lazy_pdf_text import LazyPDFText
+from pdf_parsing_section_extractor import (
+    NON_LETTER_PATTERN,
+    extract_title_and_level,
+    parse_answer_pairs,
+    create_word_mapping_dict,
+)
+from corpus_ingest import find_pdfs
+from british_council_final_document import sidecar_path
+from tasks import PreparationTask, PREPARATION_TITLE, MIDDLE_TASK_TITLE, DISCUSSION_TITLE
+
+# Titles drawn at the top of each section's first page, in document order
+SECTION_TITLES = {
+    "Preparation Task": PREPARATION_TITLE,
+    "Middle Task": MIDDLE_TASK_TITLE,
+    "Discussion": DISCUSSION_TITLE,
+}
+ANSWERS_HEADING_PATTERN = re.compile(r'^Answers:\s*$', re.MULTILINE)  # Unlike the bold "Answers" column header
+TRUE_FALSE_ANSWER_PATTERN = re.compile(r'^\s*(\d+)\.\s*(True|False)\s*$', re.MULTILINE)
+
+
+def split_generated_sections(page_texts: list) -> dict:
+    """
+    Group the pages of a generated document by section, from the title on each section's first page.
+    Continuation pages belong to the section before them.
+
+    Returns:
+        dict: Section name -> text of its pages
+    """
+    sections = {}
+    current = None
+    for text in page_texts:
+        for name, title in SECTION_TITLES.items():
+            if re.search(rf'^{re.escape(title)}\s*$', text, re.MULTILINE):
+                current = name
+                break
+        if current is not None:
+            sections[current] = sections.get(current, "") + text
+    return sections
+
+
+def split_answers(section_text: str) -> tuple:
+    """
+    Split a section's text at its last "Answers:" heading.
+
+    Returns:
+        tuple: (text before the answers, answers text); the answers text is "" if there is no heading
+    """
+    headings = list(ANSWERS_HEADING_PATTERN.finditer(section_text))
+    if not headings:
+        return section_text, ""
+    return section_text[:headings[-1].start()], section_text[headings[-1].end():]
+
+
+def normalise_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def clean_pairs(pairs: dict) -> dict:
+    """Clean a preparation task's pairs the way create_word_mapping_dict cleans what it reads back."""
+    return {NON_LETTER_PATTERN.sub('', key).strip(): NON_LETTER_PATTERN.sub('', value).strip() for key, value in pairs.items()}
+
+
+def expected_content(source: dict) -> dict:
+    """
+    What parsing a document back should recover, from its sidecar (see BritishCouncilFinalDocument.to_render_job).
+    """
+    prep_seed, _, _ = source.get("seeds") or (None, None, None)
+    preparation_task = PreparationTask(skill=source["skill"], difficulty=source["difficulty"], topic=source["topic"],
+                                       content_dict=source["preparation_task"], seed=prep_seed)
+    middle_task = source["middle_task"] or {}
+    discussion = source["discussion"] or {}
+    return {
+        "level": source["difficulty"],
+        "title": source["topic"],
+        "answer_key": preparation_task.get_answer_key(),
+        "word_mapping": clean_pairs(source["preparation_task"]["correct_pairs"]),
+        "true_false_answers": ["True" if answer else "False" for answer in middle_task.get("answers", [])],
+        "questions": [normalise_text(question) for question in middle_task.get("questions", [])],
+        "discussion_question": normalise_text(discussion.get("question", "")),
+    }
+
+
+def parse_document(pdf_path: str) -> dict:
+    """
+    Parse a generated document back into the values expected_content describes.
+    """
+    with LazyPDFText(pdf_path) as pdf_text:
+        page_texts = list(pdf_text.iter_pages())
+    sections = split_generated_sections(page_texts)
+    prep_text, prep_answers = split_answers(sections.get("Preparation Task", ""))
+    middle_text, middle_answers = split_answers(sections.get("Middle Task", ""))
+    level, title = extract_title_and_level(prep_text)
+    answer_dict = parse_answer_pairs(prep_answers) if prep_answers else {}
+    middle_normalised = normalise_text(middle_text)
+    return {
+        "sections": sorted(sections),
+        "level": level,
+        "title": title,
+        "answer_key": answer_dict,
+        "word_mapping": create_word_mapping_dict(prep_text, answer_dict),
+        "true_false_answers": [answer for _, answer in TRUE_FALSE_ANSWER_PATTERN.findall(middle_answers)],
+        "middle_text": middle_normalised,
+        "discussion_text": normalise_text(sections.get("Discussion", "")),
+    }
+
+
+def compare(expected: dict, found: dict) -> dict:
+    """
+    Returns:
+        dict: Check name -> {"expected", "found"} for every check that failed
+    """
+    mismatches = {}
+    for check in ("level", "title", "answer_key", "word_mapping", "true_false_answers"):
+        if expected[check] != found[check]:
+            mismatches[check] = {"expected": expected[check], "found": found[check]}
+    missing = [question for question in expected["questions"] if question not in found["middle_text"]]
+    if missing:
+        mismatches["questions"] = {"expected": expected["questions"], "found": None, "missing": missing}
+    if expected["discussion_question"] not in found["discussion_text"]:
+        mismatches["discussion_question"] = {"expected": expected["discussion_question"], "found": found["discussion_text"]}
+    return mismatches
+
+
+def verify_pdf(pdf_path: str) -> dict:
+    """
+    Parse one generated PDF back and compare it with its sidecar. Errors are recorded on the result
+    instead of raised, so one bad file does not stop the rest of the batch.
+
+    Returns:
+        dict: The path, the sidecar used, the failed checks and whether the document passed. A document
+        without a sidecar can only be checked for its sections, so it is reported as unverified.
+    """
+    start = time.perf_counter()
+    result = {"path": pdf_path, "source": None, "status": "error", "mismatches": {}, "error": None}
+    try:
+        found = parse_document(pdf_path)
+        missing_sections = [name for name in SECTION_TITLES if name not in found["sections"]]
+        if missing_sections:
+            result["mismatches"]["sections"] = {"expected": list(SECTION_TITLES), "found": found["sections"]}
+        source_path = sidecar_path(pdf_path)
+        if os.path.exists(source_path):
+            with open(source_path, "r", encoding="utf-8") as f:
+                source = json.load(f)
+            result["source"] = source_path
+            result["mismatches"].update(compare(expected_content(source), found))
+            result["status"] = "failed" if result["mismatches"] else "ok"
+        else:
+            result["status"] = "failed" if result["mismatches"] else "unverified"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def verify_directory(root: str, workers: int = None) -> list:
+    """
+    Verify every PDF under root with a process pool.
+
+    Returns:
+        list: One verify_pdf result per document, in path order
+    """
+    paths = find_pdfs(root)
+    if not paths:
+        return []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(verify_pdf, paths, chunksize=4))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse generated worksheets back and check them against the content they were rendered from.")
+    parser.add_argument("root", nargs="?", default="batch_output", help="Folder of generated documents and their JSON sidecars")
+    parser.add_argument("--output", default="verification.jsonl", help="JSONL file to write one result per document to")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = verify_directory(args.root, workers=args.workers)
+    with open(args.output, "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    counts = {status: sum(1 for result in results if result["status"] == status) for status in ("ok", "failed", "unverified", "error")}
+    for result in results:
+        name = os.path.basename(result["path"])
+        if result["status"] == "failed":
+            print(f"✗ {name}: {', '.join(result['mismatches'])}")
+        elif result["status"] == "error":
+            print(f"✗ {name}: {result['error']}")
+    print(f"Verified {len(results)} document(s) in {time.perf_counter() - start:.2f}s: {counts['ok']} ok, "
+          f"{counts['failed']} failed, {counts['unverified']} without a sidecar, {counts['error']} error(s) -> {args.output}")
+    return 0 if counts["failed"] == 0 and counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())